@@ -1,18 +1,34 @@
-from flask import Flask, send_from_directory, abort
+from flask import Flask, send_from_directory, abort, request
 import os
 
 app = Flask(__name__)
 
+# 事前生成されたWebP派生画像の種類（python/lib/thumbnail_variants.py と対応）
+THUMBNAIL_VARIANTS = ('list', 'card', 'detail')
+# 配信する画像の拡張子（マニフェスト・ダウンロード途中の一時ファイルは配信しない）
+THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
 @app.route('/thumbnail/<filename>')
 def serve_thumbnail(filename):
-    """サムネイル画像を提供"""
+    """サムネイル画像を提供（?size=list|card|detail で派生画像を選択）"""
     try:
+        if not filename.lower().endswith(THUMBNAIL_EXTENSIONS) or filename.startswith('.'):
+            abort(404)
+        
         # プロジェクトルートのthumbnailディレクトリを指定
         thumbnail_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'thumbnail')
         
         if not os.path.exists(thumbnail_dir):
             abort(404)
         
+        # 派生画像が指定され、生成済みであればそちらを返す
+        size = request.args.get('size')
+        if size in THUMBNAIL_VARIANTS:
+            stem, _ = os.path.splitext(filename)
+            variant_filename = f"{stem}_{size}.webp"
+            if os.path.exists(os.path.join(thumbnail_dir, variant_filename)):
+                return send_from_directory(thumbnail_dir, variant_filename)
+        
         return send_from_directory(thumbnail_dir, filename)
     except Exception as e:
         print(f"Error serving thumbnail {filename}: {e}")
@@ -10,7 +10,8 @@ vrcworld.txtにあるワールドURLからデータをダウンロードし、
 import os
 import sys
 import time
-from typing import List
+import argparse
+from typing import List, Dict, Optional, Set
 
 
 # ライブラリパスを絶対パスで追加
@@ -18,26 +19,123 @@ lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'lib'))
 if lib_path not in sys.path:
     sys.path.insert(0, lib_path)
 
-from lib.vrchat_scraper import VRChatWorldScraper
-from lib.utils import load_world_urls, save_raw_data
+from lib.vrchat_scraper import VRChatWorldScraper, DEFAULT_RATE_PER_SECOND, DEFAULT_MAX_RATE_PER_SECOND
+from lib.response_cache import create_response_cache, DEFAULT_CACHE_TTL_SECONDS
+from lib.thumbnail_downloader import ThumbnailDownloader, DEFAULT_THUMBNAIL_WORKERS
+from lib.mongodb_manager import MongoDBManager
+from lib.run_journal import RunJournal
+from lib.raw_data_store import get_raw_data_store
+from lib.progress import ProgressReporter
+from lib.utils import load_world_urls, normalize_world_id, find_fresh_raw_data, save_raw_data
+
+
+# 中断された実行を再開するためのジャーナル（cache/以下）
+RESUME_FILENAME = 'download_journal.jsonl'
+
+# 再開時に処理済みとみなす結果（エラーになったワールドは再取得する）
+RESUME_COMPLETED_OUTCOMES = ('ok', 'skipped')
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='VRChatワールドデータダウンローダー')
+    parser.add_argument('--workers', '--concurrency', dest='concurrency', type=int, default=1,
+                        help='同時リクエスト数（2以上で非同期エンジンを使用、デフォルト: 1）')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE_PER_SECOND,
+                        help=f'1秒あたりの初期リクエスト数（デフォルト: {DEFAULT_RATE_PER_SECOND}）')
+    parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE_PER_SECOND,
+                        help=f'自動調整時の1秒あたりの最大リクエスト数（デフォルト: {DEFAULT_MAX_RATE_PER_SECOND}）')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL_SECONDS / 3600,
+                        help='APIレスポンスキャッシュの有効期間（時間、0で無効、デフォルト: 24）')
+    parser.add_argument('--thumbnail-workers', type=int, default=DEFAULT_THUMBNAIL_WORKERS,
+                        help=f'サムネイルの同時ダウンロード数（デフォルト: {DEFAULT_THUMBNAIL_WORKERS}）')
+    parser.add_argument('--skip-existing', action='store_true',
+                        help='MongoDBに登録済みのワールドを取得対象から除外')
+    parser.add_argument('--max-age', type=float, default=None,
+                        help='生データの最終保存からこの時間（時間）以内のワールドは取得しない')
+    parser.add_argument('--resume-file', default=None,
+                        help=f'中断時に再開するためのジャーナル（デフォルト: cache/{RESUME_FILENAME}）')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='中断された実行があっても最初から取得し直す')
+    return parser.parse_args()
+
+
+def load_existing_world_ids() -> Set[str]:
+    """MongoDBに登録済みのワールドIDを取得"""
+    mongodb = MongoDBManager()
+    try:
+        if not mongodb.is_connected():
+            print("⚠️  MongoDBに接続できないため、登録済みワールドの除外をスキップします")
+            return set()
+        return mongodb.get_existing_world_ids()
+    finally:
+        mongodb.close()
+
+
+def select_targets(args: argparse.Namespace, raw_data_dir: str) -> List[Dict[str, str]]:
+    """vrcworld.txtから取得対象の[{world_id, url}]を作成（登録済み・生データが新しいワールドを除外）"""
+    # 登録済みワールドを除外する場合は先にIDを取得
+    existing_world_ids: Optional[Set[str]] = None
+    if args.skip_existing:
+        existing_world_ids = load_existing_world_ids()
+        print(f"🗄️  MongoDB登録済み: {len(existing_world_ids)}件")
+    
+    # ワールドURLリストを読み込み（ルートディレクトリのvrcworld.txtを参照）
+    # 同一ワールドの重複行やクエリ違いのURLは1件にまとめる
+    vrcworld_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'vrcworld.txt')
+    targets = [
+        {'world_id': normalize_world_id(url), 'url': url}
+        for url in load_world_urls(vrcworld_path, exclude=existing_world_ids)
+    ]
+    
+    # 生データが新しいワールドはAPIに問い合わせない
+    if args.max_age is not None and targets:
+        fresh_world_ids = find_fresh_raw_data(raw_data_dir, [target['world_id'] for target in targets], args.max_age * 3600)
+        if fresh_world_ids:
+            print(f"🆕 生データが{args.max_age:g}時間以内のため{len(fresh_world_ids)}件をスキップします")
+            targets = [target for target in targets if target['world_id'] not in fresh_world_ids]
+    return targets
 
 
 def main():
     """メイン処理"""
+    args = parse_args()
+    
     print("🌍 VRChatワールドデータダウンローダー")
     print("=" * 50)
     
     # スクレイパー初期化
-    scraper = VRChatWorldScraper()
+    scraper = VRChatWorldScraper(
+        rate_per_second=args.rate,
+        max_connections=max(10, args.concurrency + args.thumbnail_workers),
+        max_rate_per_second=args.max_rate,
+        cache=create_response_cache(
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'vrchat_api'),
+            args.cache_ttl
+        )
+    )
+    raw_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'raw_data')
+    raw_data_store = get_raw_data_store(raw_data_dir)
     
-    # ワールドURLリストを読み込み（ルートディレクトリのvrcworld.txtを参照）
-    vrcworld_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'vrcworld.txt')
-    world_urls = load_world_urls(vrcworld_path)
-    if not world_urls:
-        print("❌ vrcworld.txtにワールドURLが見つかりません")
-        return
+    # 前回の実行が中断されていれば、記録済みの対象リストのうち未処理のワールドから再開する
+    journal = RunJournal(args.resume_file or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', RESUME_FILENAME))
+    resumed = None if args.no_resume else journal.load()
+    if resumed is not None:
+        all_targets, outcomes = resumed
+        completed = {world_id for world_id, outcome in outcomes.items() if outcome in RESUME_COMPLETED_OUTCOMES}
+        targets = [target for target in all_targets if target['world_id'] not in completed]
+        print(f"♻️  中断された実行を再開します: 処理済み {len(completed)}件 / 残り {len(targets)}件")
+    else:
+        targets = select_targets(args, raw_data_dir)
+        if not targets:
+            print("❌ 取得対象のワールドURLがありません")
+            journal.complete()
+            return
+        journal.start(targets)
     
-    print(f"📋 {len(world_urls)}件のワールドURLを読み込みました")
+    world_urls = [target['url'] for target in targets]
+    url_to_world_id = {target['url']: target['world_id'] for target in targets}
+    print(f"📋 {len(world_urls)}件のワールドURLを取得します（同時 {args.concurrency}件）")
     print("-" * 50)
     
     success_count = 0
@@ -45,66 +143,75 @@ def main():
     error_count = 0
     error_worlds: List[str] = []  # エラーワールドのリスト
     
-    for i, url in enumerate(world_urls, 1):
-        print(f"\n🔄 [{i}/{len(world_urls)}] 処理中: {url}")
-        
-        try:
-            # ワールドデータを取得
-            world_data = scraper.scrape_world_by_url(url)
-            if not world_data:
-                print(f"❌ ワールドデータの取得に失敗: {url}")
-                error_count += 1
-                error_worlds.append(f"{url} - データ取得失敗")
-                continue
-            
-            world_id = world_data.get('id')
-            if not world_id:
-                print(f"❌ ワールドIDが見つかりません: {url}")
-                error_count += 1
-                error_worlds.append(f"{url} - ワールドID不明")
-                continue
-            
-            # 既存データを使用したかどうかを判定
-            is_from_cache = world_data.get('_from_cache', False)
-            
-            # サムネイルダウンロード（既存ファイルはスキップ）
-            thumbnail_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'thumbnail')
-            thumbnail_result = scraper.download_thumbnail(world_data, thumbnail_dir)
-            if thumbnail_result:
-                status, _ = thumbnail_result
-                if status == 'downloaded':
-                    print(f"✅ サムネイル: {world_id}.jpg（ダウンロード完了）")
-                elif status == 'skipped':
-                    print(f"⏭️  サムネイル: {world_id}.jpg（既存ファイル）")
-                else:
-                    print(f"⚠️  サムネイル: ダウンロード失敗")
-            else:
-                print(f"⚠️  サムネイル: ダウンロード失敗")
-            
-            # 生データを保存（save_raw_dataの仕様に合わせてworld_dataを直接渡す）
-            raw_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'raw_data')
-            if save_raw_data(world_data, raw_data_dir):
-                if is_from_cache:
-                    print(f"✅ 生データ: {world_id}（既存データ使用）")
+    # サムネイルはAPI取得とは別のワーカープールでダウンロード（取得元URLまたは内容が変わった画像のみ）
+    thumbnail_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'thumbnail')
+    thumbnail_downloader = ThumbnailDownloader(scraper, thumbnail_dir, max_workers=args.thumbnail_workers)
+    progress = ProgressReporter(len(world_urls))
+    
+    def record_error(url: str, message: str, log_entry: str) -> None:
+        """エラーを表示・記録（再開時は再取得する）"""
+        nonlocal error_count
+        progress.clear_line()
+        print(message)
+        error_count += 1
+        error_worlds.append(log_entry)
+        journal.record(url_to_world_id.get(url, url), 'error')
+        progress.advance('エラー')
+    
+    try:
+        for url, status, world_data in scraper.fetch_many(world_urls, args.concurrency):
+            try:
+                # 取得したワールドデータを確認
+                if status == 'rate_limited':
+                    record_error(url, f"⏳ レート制限が解除されませんでした: {url}", f"{url} - レート制限")
+                    continue
+                if status == 'circuit_open':
+                    record_error(url, f"⛔ API障害のため未取得: {url}", f"{url} - API障害")
+                    continue
+                if not world_data:
+                    record_error(url, f"❌ ワールドデータの取得に失敗: {url}", f"{url} - データ取得失敗")
+                    continue
+                
+                world_id = world_data.get('id')
+                if not world_id:
+                    record_error(url, f"❌ ワールドIDが見つかりません: {url}", f"{url} - ワールドID不明")
+                    continue
+                
+                # サムネイルダウンロードを登録（完了を待たずに次のワールドへ進む）
+                thumbnail_downloader.submit(world_data)
+                
+                # 既存データを使用した場合、保存済みの生データがあれば追記しない
+                # （古いデータが現在時刻のバージョンとして記録され、--max-ageの判定も誤るため）
+                if world_data.get('_from_cache', False) and world_id in raw_data_store:
                     skip_count += 1
+                    journal.record(url_to_world_id.get(url, world_id), 'skipped')
+                    progress.advance('既存')
                 else:
-                    print(f"✅ 生データ: {world_id}（保存完了）")
+                    # 生データを保存（save_raw_dataの仕様に合わせてworld_dataを直接渡す）
+                    if not save_raw_data(world_data, raw_data_dir):
+                        record_error(url, f"❌ 生データ: 保存失敗 ({world_id})", f"{url} - 生データ保存失敗 (ID: {world_id})")
+                        continue
                     success_count += 1
-            else:
-                print(f"❌ 生データ: 保存失敗")
-                error_count += 1
-                error_worlds.append(f"{url} - 生データ保存失敗 (ID: {world_id})")
-            
-            # レート制限（2秒間隔）- 既存データ使用時はスキップ
-            if i < len(world_urls) and not is_from_cache:
-                print("⏳ 2秒待機中...")
-                time.sleep(2)
-                
-        except Exception as e:
-            print(f"❌ エラー: {str(e)}")
-            error_count += 1
-            error_worlds.append(f"{url} - 例外エラー: {str(e)}")
-            continue
+                    journal.record(url_to_world_id.get(url, world_id), 'ok')
+                    progress.advance('成功')
+                    
+            except Exception as e:
+                record_error(url, f"❌ エラー: {str(e)}", f"{url} - 例外エラー: {str(e)}")
+                continue
+        
+        progress.finish()
+        # 最後まで処理できたのでジャーナルを削除
+        journal.complete()
+    except KeyboardInterrupt:
+        progress.clear_line()
+        print(f"\n⚠️  中断しました。次回の実行で残りのワールドから再開します（{journal.path}）")
+    finally:
+        # 中断時はジャーナルを残す
+        journal.close()
+    
+    # 残りのサムネイルダウンロード完了を待機
+    print("\n⏳ サムネイルのダウンロード完了を待機中...")
+    thumbnail_results = thumbnail_downloader.close()
     
     # 結果サマリー
     print("\n" + "=" * 50)
@@ -113,6 +220,11 @@ def main():
     print(f"⏭️  スキップ: {skip_count}件")
     print(f"❌ エラー: {error_count}件")
     print(f"📋 合計: {len(world_urls)}件")
+    if scraper.cache is not None:
+        cache_stats = scraper.cache.stats()
+        print(f"🗃️  キャッシュ: ヒット {cache_stats['hits']}件 / ミス {cache_stats['misses']}件")
+    print(f"📷 サムネイル: ダウンロード {thumbnail_results['downloaded']}件 / "
+          f"既存 {thumbnail_results['skipped']}件 / 失敗 {thumbnail_results['error']}件")
     print("=" * 50)
     
     # エラーワールドのログ出力
@@ -0,0 +1,83 @@
+"""
+Webキャッシュ無効化ライブラリ
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# ワールド一覧に表示・ソートに使われるフィールドが変わった場合に無効化するキャッシュ
+LISTING_CACHE_PREFIXES = ('worlds:list', 'admin:worlds:list', 'worlds:evaluation:list', 'worlds:timeline:month')
+# 件数（検索条件・タグ絞り込み）のキャッシュ
+COUNT_CACHE_PREFIXES = ('worlds:count', 'admin:worlds:count')
+# 公開日ごとの集計キャッシュ
+TIMELINE_STATS_CACHE_PREFIXES = ('worlds:timeline:stats',)
+
+# フィールド -> 変更時に無効化するキャッシュのプレフィックス
+# 説明文などの変更はVRChat側のupdated_atの変更として検出する
+FIELD_CACHE_PREFIXES: Dict[str, tuple] = {
+    'name': LISTING_CACHE_PREFIXES,
+    'authorName': LISTING_CACHE_PREFIXES,
+    'imageUrl': LISTING_CACHE_PREFIXES,
+    'thumbnailImageUrl': LISTING_CACHE_PREFIXES,
+    'capacity': LISTING_CACHE_PREFIXES,
+    'releaseStatus': LISTING_CACHE_PREFIXES,
+    'visits': LISTING_CACHE_PREFIXES,
+    'favorites': LISTING_CACHE_PREFIXES,
+    'popularity': LISTING_CACHE_PREFIXES,
+    'updated_at': LISTING_CACHE_PREFIXES,
+    'tags': LISTING_CACHE_PREFIXES + COUNT_CACHE_PREFIXES,
+    'publicationDate': LISTING_CACHE_PREFIXES + TIMELINE_STATS_CACHE_PREFIXES,
+    'created_at': LISTING_CACHE_PREFIXES + TIMELINE_STATS_CACHE_PREFIXES,
+}
+TRACKED_FIELDS = tuple(FIELD_CACHE_PREFIXES)
+
+# ワールドが追加された場合はすべての一覧・件数・集計が変わる
+NEW_WORLD_CACHE_PREFIXES = LISTING_CACHE_PREFIXES + COUNT_CACHE_PREFIXES + TIMELINE_STATS_CACHE_PREFIXES
+
+# これを超える件数のワールドが変更された場合は個別指定をやめ、個別キャッシュをまとめて削除する
+MAX_INVALIDATION_WORLD_IDS = 1000
+BY_ID_CACHE_PREFIX = 'worlds:by-id'
+
+
+class CacheInvalidationTracker:
+    """実行中に変更されたワールドIDとフィールドを記録し、Webキャッシュの無効化対象を求める"""
+
+    def __init__(self):
+        self.world_ids: Set[str] = set()
+        self.fields: Set[str] = set()
+        self.new_world_count = 0
+
+    def record_world(self, world_id: str, world_data: Dict[str, Any],
+                     previous: Optional[Dict[str, Any]] = None) -> None:
+        """保存したワールドを記録（previousは保存前のドキュメント、Noneは新規追加）"""
+        if previous is None:
+            self.world_ids.add(world_id)
+            self.new_world_count += 1
+            return
+        changed = [field for field in TRACKED_FIELDS if world_data.get(field) != previous.get(field)]
+        if changed:
+            self.record_fields(world_id, changed)
+
+    def record_fields(self, world_id: str, fields: Iterable[str]) -> None:
+        """ワールドの変更されたフィールドを記録"""
+        self.world_ids.add(world_id)
+        self.fields.update(fields)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.world_ids)
+
+    def prefixes(self) -> List[str]:
+        """無効化するキャッシュのプレフィックス"""
+        prefixes: Set[str] = set()
+        if self.new_world_count:
+            prefixes.update(NEW_WORLD_CACHE_PREFIXES)
+        for field in self.fields:
+            prefixes.update(FIELD_CACHE_PREFIXES.get(field, ()))
+        if len(self.world_ids) > MAX_INVALIDATION_WORLD_IDS:
+            prefixes.add(BY_ID_CACHE_PREFIX)
+        return sorted(prefixes)
+
+    def payload(self) -> Dict[str, List[str]]:
+        """キャッシュクリアAPIに送る {worldIds, prefixes}"""
+        world_ids = sorted(self.world_ids) if len(self.world_ids) <= MAX_INVALIDATION_WORLD_IDS else []
+        return {'worldIds': world_ids, 'prefixes': self.prefixes()}
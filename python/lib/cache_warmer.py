@@ -0,0 +1,84 @@
+"""
+Webキャッシュ事前読み込みライブラリ
+"""
+
+import os
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARM_CONCURRENCY = 4
+DEFAULT_WARM_TIMEOUT_SECONDS = 60
+
+# 事前読み込みするクエリの既定値（--warm-configのJSONファイルで上書き可能）
+DEFAULT_WARM_CONFIG: Dict[str, Any] = {
+    # トップページのソート順ごとに先頭から読み込むページ数
+    'sorts': ['updated_at', 'created_at', 'visits', 'favorites'],
+    'pages': 3,
+    'limit': 12,  # トップページの1ページあたりの件数
+    # 付与数の多いシステムタグの一覧（1ページ目）を読み込む件数
+    'popular_tags': 5,
+    # そのまま読み込む追加のパス
+    'paths': ['/api/worlds/timeline/stats'],
+}
+
+
+def load_warm_config(config_path: Optional[str] = None) -> Dict[str, Any]:
+    """事前読み込みの設定を読み込み（未指定時は環境変数CACHE_WARM_CONFIG、指定がない・読み込めない場合は既定値）"""
+    config = dict(DEFAULT_WARM_CONFIG)
+    config_path = config_path or os.getenv('CACHE_WARM_CONFIG')
+    if config_path:
+        try:
+            config.update(json_codec.load_file(config_path))
+        except Exception as e:
+            logger.warning(f"⚠️ キャッシュ事前読み込み設定の読み込みエラー ({config_path}): {e}")
+    return config
+
+
+def build_warm_paths(config: Dict[str, Any], popular_tag_ids: Optional[List[str]] = None) -> List[str]:
+    """設定から読み込むAPIパスの一覧を作成（重い集計を先に並べる）"""
+    paths: List[str] = list(config.get('paths', []))
+    limit = config.get('limit', 12)
+    for sort in config.get('sorts', []):
+        for page in range(1, config.get('pages', 0) + 1):
+            paths.append(f"/api/worlds?{urlencode({'page': page, 'limit': limit, 'sort': sort})}")
+    for tag_id in popular_tag_ids or []:
+        paths.append(f"/api/worlds?{urlencode({'page': 1, 'limit': limit, 'sort': 'updated_at', 'tag': tag_id})}")
+    # 重複を除いて順序を保つ
+    return list(dict.fromkeys(paths))
+
+
+def warm_cache(base_url: str, paths: List[str], concurrency: int = DEFAULT_WARM_CONCURRENCY,
+               timeout: float = DEFAULT_WARM_TIMEOUT_SECONDS) -> Tuple[int, List[str]]:
+    """同時実行数を制限してAPIを呼び出し、(成功件数, 失敗したパス)を返す"""
+    concurrency = max(1, concurrency)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    def fetch(path: str) -> bool:
+        try:
+            response = session.get(f"{base_url.rstrip('/')}{path}", timeout=timeout)
+            if not response.ok:
+                logger.warning(f"⚠️ キャッシュ事前読み込み失敗 {path}: {response.status_code}")
+            return response.ok
+        except requests.RequestException as e:
+            logger.warning(f"⚠️ キャッシュ事前読み込み通信エラー {path}: {e}")
+            return False
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='cache-warm') as executor:
+            results = list(executor.map(fetch, paths))
+    finally:
+        session.close()
+    failed = [path for path, ok in zip(paths, results) if not ok]
+    return len(paths) - len(failed), failed
+
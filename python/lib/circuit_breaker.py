@@ -0,0 +1,81 @@
+"""
+サーキットブレーカーライブラリ
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RECOVERY_TIMEOUT_SECONDS = 60.0
+
+
+class CircuitBreaker:
+    """連続失敗で外部APIへのリクエストを遮断するサーキットブレーカー
+
+    - closed: 通常状態。連続失敗がfailure_thresholdに達するとopenへ
+    - open: 全リクエストを即座に拒否。recovery_timeout経過後にhalf_openへ
+    - half_open: 試行リクエストを1件だけ通し、成功すればclosed、失敗すれば再びopenへ
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 recovery_timeout: float = DEFAULT_RECOVERY_TIMEOUT_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """リクエストを送信してよいか判定"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+                logger.info("🔌 サーキットブレーカー: 試行リクエストを送信します（half-open）")
+            # half_open: 試行リクエストは同時に1件のみ
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """リクエスト成功を記録"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("✅ サーキットブレーカー: API復旧を確認しました（closed）")
+            self.state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """リクエスト失敗を記録"""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"⛔ サーキットブレーカー: {self._consecutive_failures}件連続で失敗したため"
+                        f"{self.recovery_timeout:.0f}秒間リクエストを遮断します（open）"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """遮断中かどうか"""
+        with self._lock:
+            return self.state == self.OPEN
@@ -0,0 +1,82 @@
+"""
+MongoDB接続状態監視ライブラリ
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Optional
+from pymongo import monitoring
+from pymongo.errors import ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+# 接続断と判定した後、次にpingで再確認するまでの間隔
+DEFAULT_RECHECK_INTERVAL_SECONDS = 5.0
+
+
+class ConnectionHealthMonitor(monitoring.TopologyListener):
+    """MongoDBの接続状態をキャッシュするモニター
+
+    pymongoのトポロジー監視イベント（バックグラウンドのハートビート）で
+    書き込み可能なサーバーの有無を追跡するため、操作のたびにpingを送る必要がない。
+    操作が接続エラーで失敗した場合は接続断として記録し、
+    recheck_interval経過後の次回確認時にpingで再確認する。
+    トポロジーイベントは接続済みの記録にのみ使い、接続断とはみなさない
+    （接続直後のレプリカセット探索中もPrimary未検出のイベントが届くため、未確認に戻して次回pingで確認する）。
+    """
+
+    def __init__(self, recheck_interval: float = DEFAULT_RECHECK_INTERVAL_SECONDS):
+        self.recheck_interval = recheck_interval
+        self._healthy: Optional[bool] = None  # None: 未確認
+        self._checked_at = 0.0
+        self._pinged = False  # 一度でもpingを実行したか
+        self._lock = threading.Lock()
+
+    def opened(self, event: monitoring.TopologyOpenedEvent) -> None:
+        pass
+
+    def description_changed(self, event: monitoring.TopologyDescriptionChangedEvent) -> None:
+        """トポロジーの変化を反映（書き込み可能なサーバーがなくなった場合は未確認に戻す）"""
+        if event.new_description.has_writable_server():
+            self._set_state(True)
+            return
+        with self._lock:
+            if self._healthy:
+                self._healthy = None
+
+    def closed(self, event: monitoring.TopologyClosedEvent) -> None:
+        self._set_state(False)
+
+    def record_error(self, error: Exception) -> None:
+        """操作の失敗を記録（接続エラーの場合のみ接続断とみなす）"""
+        if isinstance(error, ConnectionFailure):
+            self._set_state(False)
+
+    def check(self, ping: Callable[[], bool], force: bool = False) -> bool:
+        """キャッシュされた接続状態を返す（初回・未確認・再確認時期、またはforce指定時のみpingを実行）"""
+        with self._lock:
+            healthy = self._healthy
+            checked_at = self._checked_at
+            pinged = self._pinged
+        if pinged and not force:
+            if healthy:
+                return True
+            if healthy is False and time.monotonic() - checked_at < self.recheck_interval:
+                return False
+        result = ping()
+        with self._lock:
+            self._pinged = True
+        self._set_state(result)
+        return result
+
+    def _set_state(self, healthy: bool) -> None:
+        """接続状態を更新"""
+        with self._lock:
+            if self._healthy is not None and self._healthy != healthy:
+                if healthy:
+                    logger.info("✅ MongoDB接続が復旧しました")
+                else:
+                    logger.warning("⚠️ MongoDBへの接続が切断されました")
+            self._healthy = healthy
+            self._checked_at = time.monotonic()
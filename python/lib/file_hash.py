@@ -0,0 +1,21 @@
+"""
+ファイルハッシュライブラリ
+"""
+
+import hashlib
+from typing import Optional
+
+# ハッシュ計算時の読み込み単位
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(filepath: str) -> Optional[str]:
+    """ファイルのSHA-256ハッシュを計算（読み込めない場合はNone）"""
+    try:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
@@ -0,0 +1,87 @@
+"""
+JSONコーデックライブラリ
+
+orjson / msgspec がインストールされていれば高速なエンコーダー・デコーダーを使用し、
+なければ標準ライブラリのjsonにフォールバックする。
+ファイルの読み書きは拡張子（.gz / .zst）から圧縮形式を判定する。
+"""
+
+import io
+import json
+import gzip
+import logging
+from typing import Any, IO, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    BACKEND = 'orjson'
+except ImportError:
+    orjson = None
+    try:
+        import msgspec
+        BACKEND = 'msgspec'
+    except ImportError:
+        msgspec = None
+        BACKEND = 'json'
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# デコード失敗時に送出される例外（どのバックエンドでもValueErrorの派生）
+DECODE_ERRORS: Tuple[Type[Exception], ...] = (ValueError,)
+if BACKEND == 'msgspec':
+    DECODE_ERRORS = (ValueError, msgspec.DecodeError)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """オブジェクトをUTF-8のJSONバイト列に変換（indent=Trueで2スペースインデント）"""
+    if BACKEND == 'orjson':
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option, default=str)
+    if BACKEND == 'msgspec' and not indent:
+        return msgspec.json.encode(obj, enc_hook=str)
+    return json.dumps(
+        obj, ensure_ascii=False, indent=2 if indent else None,
+        separators=None if indent else (',', ':'), default=str
+    ).encode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    """JSONバイト列（または文字列）をオブジェクトに変換"""
+    if BACKEND == 'orjson':
+        return orjson.loads(data)
+    if BACKEND == 'msgspec':
+        return msgspec.json.decode(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8')
+    return json.loads(data)
+
+
+def open_binary(path: str, mode: str = 'rb') -> IO[bytes]:
+    """拡張子に応じて透過的に圧縮・展開するバイナリファイルを開く（mode: 'rb' / 'wb'）"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstd圧縮ファイルの読み書きには zstandard のインストールが必要です")
+        raw = open(path, mode)
+        if 'r' in mode:
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+    return open(path, mode)
+
+
+def load_file(path: str) -> Any:
+    """JSONファイルを読み込み（.gz / .zst は自動展開）"""
+    with open_binary(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_file(obj: Any, path: str, indent: bool = False) -> None:
+    """JSONファイルに書き込み（.gz / .zst は自動圧縮）"""
+    with open_binary(path, 'wb') as f:
+        f.write(dumps(obj, indent=indent))
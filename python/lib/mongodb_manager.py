@@ -5,15 +5,19 @@ MongoDB Atlas設定ライブラリ
 import os
 import json
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Any
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure, OperationFailure
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Set, Iterable, Iterator, Callable, Tuple
+import bson
+from pymongo import MongoClient, ReplaceOne, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import ConnectionFailure, OperationFailure, BulkWriteError
 from pymongo.database import Database
 from pymongo.collection import Collection
 import certifi
 from dotenv import load_dotenv
 
+from .connection_health import ConnectionHealthMonitor
+from .refresh_policy import compute_next_refresh_at
+
 logger = logging.getLogger(__name__)
 
 # 環境変数読み込み
@@ -26,6 +30,15 @@ def load_environment():
             return
     load_dotenv()
 
+# 一括保存でまとめて送信する最大件数・最大サイズ
+DEFAULT_BULK_BATCH_SIZE = 500
+DEFAULT_BULK_BATCH_BYTES = 8 * 1024 * 1024  # 8MB
+# 更新候補をカーソルから1回に読み込む件数
+DEFAULT_CANDIDATE_BATCH_SIZE = 1000
+
+# 一括保存の結果通知 (world_id, success, world_data)
+BulkResultCallback = Callable[[str, bool, Dict[str, Any]], None]
+
 class MongoDBManager:
     """MongoDB Atlas管理クラス"""
     
@@ -34,6 +47,8 @@ class MongoDBManager:
         self._client: Optional[MongoClient[Dict[str, Any]]] = None
         self._db: Optional[Database[Dict[str, Any]]] = None
         self._collection: Optional[Collection[Dict[str, Any]]] = None
+        # 接続状態はトポロジー監視イベントで追跡し、操作ごとのpingを省く
+        self._health = ConnectionHealthMonitor()
         self._initialize_connection()
     
     def _initialize_connection(self):
@@ -52,23 +67,50 @@ class MongoDBManager:
                 tlsCAFile=certifi.where(),
                 serverSelectionTimeoutMS=5000,
                 connectTimeoutMS=10000,
-                socketTimeoutMS=10000
+                socketTimeoutMS=10000,
+                event_listeners=[self._health]
             )
             
             # 接続テスト
-            self._client.admin.command('ping')
+            if not self._health.check(self._ping, force=True):
+                raise ConnectionFailure("pingに応答がありません")
             
             self._db = self._client[db_name]
             self._collection = self._db[collection_name]
             
             logger.info(f"✅ MongoDB Atlas接続成功: {db_name}.{collection_name}")
+            self._ensure_indexes()
             
         except Exception as e:
             logger.error(f"❌ MongoDB Atlas接続エラー: {e}")
             self._client = None
     
+    def _ensure_indexes(self) -> None:
+        """更新対象の選定・新規ワールドの確保・タグ付与・リトライキューに使うインデックスを作成（既に存在する場合は何もしない）"""
+        if self._collection is None or self._db is None:
+            return
+        indexes = [
+            (self._collection, [('next_refresh_at', ASCENDING)], {'name': 'next_refresh_at'}),
+            (self._db['new_worlds'], [('status', ASCENDING), ('lease_expires_at', ASCENDING)], {'name': 'status_lease'}),
+            # 同じワールド・タグのリレーションを重複させない（存在確認なしでupsertできるようにする）
+            (self._db['worlds_tag'], [('worldId', ASCENDING), ('tagId', ASCENDING)], {'name': 'worldId_tagId', 'unique': True}),
+            (self._db['retry_queue'], [('world_id', ASCENDING)], {'name': 'world_id', 'unique': True}),
+            (self._db['retry_queue'], [('next_attempt_at', ASCENDING)], {'name': 'next_attempt_at'}),
+        ]
+        for collection, keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                logger.warning(f"⚠️ インデックス作成エラー ({collection.name}.{options['name']}): {e}")
+    
     def is_connected(self) -> bool:
-        """接続状態確認"""
+        """接続状態確認（キャッシュされた状態を返し、接続断の後のみpingで再確認）"""
+        if self._client is None:
+            return False
+        return self._health.check(self._ping)
+    
+    def _ping(self) -> bool:
+        """pingで接続を確認"""
         try:
             if self._client is None:
                 return False
@@ -77,26 +119,38 @@ class MongoDBManager:
         except Exception:
             return False
     
+    @staticmethod
+    def _build_world_document(world_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """保存用のワールドドキュメントを作成（IDがない場合はNone）"""
+        world_id = world_data.get('id')
+        if not world_id:
+            return None
+        
+        document = {
+            **world_data,
+            'world_id': world_id,
+            'scraped_at': datetime.now(),  # アップロード日時を別フィールドで記録
+            # updated_atとcreated_atは元データを保持
+        }
+        
+        # created_atが存在しない場合のみデフォルト値を設定
+        if 'created_at' not in document:
+            document['created_at'] = datetime.now()
+        
+        # 次回更新日時（更新対象の選定はこのフィールドのインデックスで行う）
+        document['next_refresh_at'] = compute_next_refresh_at(document['scraped_at'], document.get('updated_at'))
+        return document
+    
     def save_world_data(self, world_data: Dict[str, Any]) -> bool:
         """ワールドデータを保存"""
         try:
             if not self.is_connected() or self._collection is None:
                 return False
             
-            world_id = world_data.get('id')
-            if not world_id:
+            document = self._build_world_document(world_data)
+            if document is None:
                 return False
-            
-            document = {
-                **world_data,
-                'world_id': world_id,
-                'scraped_at': datetime.now(),  # アップロード日時を別フィールドで記録
-                # updated_atとcreated_atは元データを保持
-            }
-            
-            # created_atが存在しない場合のみデフォルト値を設定
-            if 'created_at' not in document:
-                document['created_at'] = datetime.now()
+            world_id = document['world_id']
             
             result = self._collection.replace_one(
                 {'world_id': world_id},
@@ -108,9 +162,188 @@ class MongoDBManager:
             return result.upserted_id is not None or result.modified_count > 0 or result.matched_count > 0
             
         except Exception as e:
+            self._health.record_error(e)
             logger.error(f"❌ MongoDB保存エラー: {e}")
             return False
     
+    def bulk_writer(self, batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                    max_batch_bytes: int = DEFAULT_BULK_BATCH_BYTES,
+                    on_result: Optional[BulkResultCallback] = None) -> "BulkWorldWriter":
+        """ワールドデータを一括保存するライターを作成"""
+        return BulkWorldWriter(self, batch_size, max_batch_bytes, on_result)
+    
+    def save_worlds_bulk(self, worlds: Iterable[Dict[str, Any]],
+                         batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                         max_batch_bytes: int = DEFAULT_BULK_BATCH_BYTES,
+                         on_result: Optional[BulkResultCallback] = None) -> "BulkWorldWriter":
+        """複数のワールドデータをbulk_writeでまとめて保存
+
+        ワールドごとの成否はon_resultで通知し、成功・失敗件数と送信回数を持つライターを返す。
+        """
+        with self.bulk_writer(batch_size, max_batch_bytes, on_result) as writer:
+            for world_data in worlds:
+                try:
+                    writer.add(world_data)
+                except Exception as e:
+                    world_id = str(world_data.get('id', ''))
+                    logger.error(f"❌ MongoDB一括保存エラー ({world_id}): {e}")
+                    writer._report(world_id, False, world_data)
+        return writer
+    
+    def touch_world(self, world_id: str, updated_at: Any = None) -> bool:
+        """取得日時(scraped_at)と次回更新日時のみ更新（304 Not Modified時に使用）"""
+        try:
+            if not self.is_connected() or self._collection is None:
+                return False
+            
+            scraped_at = datetime.now()
+            result = self._collection.update_one(
+                {'world_id': world_id},
+                {'$set': {
+                    'scraped_at': scraped_at,
+                    'next_refresh_at': compute_next_refresh_at(scraped_at, updated_at)
+                }}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ MongoDB取得日時更新エラー ({world_id}): {e}")
+            return False
+    
+    def get_refresh_candidates(self, now: Optional[datetime] = None,
+                               projection: Optional[Dict[str, Any]] = None,
+                               batch_size: int = DEFAULT_CANDIDATE_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """次回更新日時を過ぎたワールドを取得（next_refresh_at未設定のワールドも含む）
+
+        全件をメモリに載せないよう、カーソルからbatch_size件ずつ読み込みながら返す。
+        """
+        try:
+            if not self.is_connected() or self._collection is None:
+                return
+            
+            now = now or datetime.now(timezone.utc)
+            # {'next_refresh_at': None} はフィールド未設定のドキュメントにも一致し、同じインデックスを使用する
+            query = {'$or': [
+                {'next_refresh_at': {'$lte': now}},
+                {'next_refresh_at': None}
+            ]}
+            yield from self._collection.find(query, projection, batch_size=batch_size)
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ 更新対象ワールド取得エラー: {e}")
+    
+    def set_next_refresh_at(self, next_refresh_times: Dict[str, datetime]) -> int:
+        """次回更新日時をまとめて設定し、更新件数を返す"""
+        try:
+            if not next_refresh_times or not self.is_connected() or self._collection is None:
+                return 0
+            
+            operations = [
+                UpdateOne({'world_id': world_id}, {'$set': {'next_refresh_at': next_refresh_at}})
+                for world_id, next_refresh_at in next_refresh_times.items()
+            ]
+            result = self._collection.bulk_write(operations, ordered=False)
+            return result.modified_count
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ 次回更新日時の設定エラー: {e}")
+            return 0
+    
+    @staticmethod
+    def _claimable_new_world_query(worker_id: str, now: datetime) -> Dict[str, Any]:
+        """確保可能なnew_worldsドキュメントの条件（処理待ち・エラー・リース切れ）"""
+        return {
+            '$or': [
+                {'status': {'$in': ['pending', 'error']}},
+                {'status': 'processing', 'lease_expires_at': {'$lte': now}},
+                # リース導入前に処理中のまま残ったドキュメント
+                {'status': 'processing', 'lease_expires_at': None}
+            ],
+            # 同じ実行で処理済み（エラー・持ち越し）のドキュメントは再確保しない
+            'worker_id': {'$ne': worker_id}
+        }
+    
+    def count_claimable_new_worlds(self, worker_id: str) -> int:
+        """確保可能なnew_worldsドキュメント数を取得"""
+        try:
+            collection = self.get_collection('new_worlds')
+            if collection is None:
+                return 0
+            return collection.count_documents(self._claimable_new_world_query(worker_id, datetime.now()))
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ 新規ワールド件数取得エラー: {e}")
+            return 0
+    
+    def claim_new_world(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """new_worldsドキュメントを1件リース付きで確保（確保できるものがない場合はNone）"""
+        try:
+            collection = self.get_collection('new_worlds')
+            if collection is None:
+                return None
+            
+            now = datetime.now()
+            return collection.find_one_and_update(
+                self._claimable_new_world_query(worker_id, now),
+                {
+                    '$set': {
+                        'status': 'processing',
+                        'worker_id': worker_id,
+                        'processed_at': now,
+                        'lease_expires_at': now + timedelta(seconds=lease_seconds)
+                    },
+                    '$inc': {'claim_count': 1}
+                },
+                sort=[('created_at', ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ 新規ワールド確保エラー: {e}")
+            return None
+    
+    def release_new_world(self, new_world_id: Any, worker_id: str, fields: Dict[str, Any]) -> bool:
+        """確保したnew_worldsドキュメントを更新してリースを解放（リースを失っていた場合はFalse）"""
+        try:
+            collection = self.get_collection('new_worlds')
+            if collection is None:
+                return False
+            
+            result = collection.update_one(
+                {'_id': new_world_id, 'worker_id': worker_id, 'status': 'processing'},
+                {'$set': fields, '$unset': {'lease_expires_at': ''}}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ 新規ワールドのステータス更新エラー: {e}")
+            return False
+    
+    def get_popular_tag_ids(self, limit: int, exclude: Iterable[str] = ()) -> List[str]:
+        """付与されたワールド数の多い順にタグIDを取得"""
+        try:
+            collection = self.get_collection('worlds_tag')
+            if collection is None or limit <= 0:
+                return []
+            
+            pipeline = [
+                {'$match': {'tagId': {'$nin': [tag_id for tag_id in exclude if tag_id]}}},
+                {'$group': {'_id': '$tagId', 'count': {'$sum': 1}}},
+                {'$sort': {'count': DESCENDING}},
+                {'$limit': limit}
+            ]
+            return [doc['_id'] for doc in collection.aggregate(pipeline)]
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ 人気タグ取得エラー: {e}")
+            return []
+    
     def get_all_worlds(self) -> List[Dict[str, Any]]:
         """全ワールドデータを取得"""
         try:
@@ -120,9 +353,24 @@ class MongoDBManager:
             return list(self._collection.find({}))
             
         except Exception as e:
+            self._health.record_error(e)
             logger.error(f"❌ 全ワールド取得エラー: {e}")
             return []
     
+    def get_existing_world_ids(self) -> Set[str]:
+        """登録済みの全ワールドIDを取得（world_idのみを射影）"""
+        try:
+            if not self.is_connected() or self._collection is None:
+                return set()
+            
+            cursor = self._collection.find({}, {'world_id': 1, '_id': 0})
+            return {doc['world_id'] for doc in cursor if doc.get('world_id')}
+            
+        except Exception as e:
+            self._health.record_error(e)
+            logger.error(f"❌ ワールドID取得エラー: {e}")
+            return set()
+    
     def get_collection(self, collection_name: str) -> Optional[Collection[Dict[str, Any]]]:
         """指定されたコレクションを取得"""
         try:
@@ -132,6 +380,7 @@ class MongoDBManager:
             return self._db[collection_name]
             
         except Exception as e:
+            self._health.record_error(e)
             logger.error(f"❌ コレクション取得エラー ({collection_name}): {e}")
             return None
     
@@ -145,6 +394,7 @@ class MongoDBManager:
             return {'total': total, 'connected': True}
             
         except Exception as e:
+            self._health.record_error(e)
             logger.error(f"❌ 統計取得エラー: {e}")
             return {'total': 0, 'connected': False}
     
@@ -163,6 +413,7 @@ class MongoDBManager:
             return result.modified_count > 0 or result.matched_count > 0
             
         except Exception as e:
+            self._health.record_error(e)
             logger.error(f"❌ タグ追加エラー ({world_id}, {tag}): {e}")
             return False
     
@@ -180,6 +431,7 @@ class MongoDBManager:
             return result.modified_count > 0
             
         except Exception as e:
+            self._health.record_error(e)
             logger.error(f"❌ タグ削除エラー ({world_id}, {tag}): {e}")
             return False
     
@@ -187,3 +439,82 @@ class MongoDBManager:
         """接続を閉じる"""
         if self._client:
             self._client.close()
+
+
+class BulkWorldWriter:
+    """ワールドデータのReplaceOne(upsert)を溜め、件数またはサイズが上限に達したら
+    順序なしのbulk_writeでまとめて送信するライター
+
+    送信結果はワールドごとにon_resultで通知する。
+    """
+    
+    def __init__(self, mongodb: MongoDBManager, batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                 max_batch_bytes: int = DEFAULT_BULK_BATCH_BYTES,
+                 on_result: Optional[BulkResultCallback] = None):
+        self.mongodb = mongodb
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.on_result = on_result
+        self.success_count = 0
+        self.error_count = 0
+        self.round_trips = 0
+        self._pending: List[Tuple[str, Dict[str, Any], ReplaceOne]] = []
+        self._pending_bytes = 0
+    
+    def add(self, world_data: Dict[str, Any]) -> None:
+        """保存するワールドデータを追加（上限に達したら送信）"""
+        document = MongoDBManager._build_world_document(world_data)
+        if document is None:
+            self._report(str(world_data.get('world_id', '')), False, world_data)
+            return
+        
+        world_id = document['world_id']
+        size = len(bson.encode(document))
+        if self._pending and self._pending_bytes + size > self.max_batch_bytes:
+            self.flush()
+        self._pending.append((world_id, world_data, ReplaceOne({'world_id': world_id}, document, upsert=True)))
+        self._pending_bytes += size
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> None:
+        """溜まっている操作を送信"""
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        
+        failed_indexes: Set[int] = set()
+        collection = self.mongodb._collection
+        try:
+            if collection is None:
+                raise ConnectionFailure("MongoDBに接続されていません")
+            self.round_trips += 1
+            collection.bulk_write([op for _, _, op in pending], ordered=False)
+        except BulkWriteError as e:
+            # 順序なし実行のため、失敗した操作以外は書き込まれている
+            failed_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+            logger.error(f"❌ MongoDB一括保存エラー: {len(failed_indexes)}/{len(pending)}件が失敗")
+        except Exception as e:
+            self.mongodb._health.record_error(e)
+            failed_indexes = set(range(len(pending)))
+            logger.error(f"❌ MongoDB一括保存エラー: {e}")
+        
+        for index, (world_id, world_data, _) in enumerate(pending):
+            self._report(world_id, index not in failed_indexes, world_data)
+    
+    def _report(self, world_id: str, success: bool, world_data: Dict[str, Any]) -> None:
+        """1件分の結果を集計・通知"""
+        if success:
+            self.success_count += 1
+        else:
+            self.error_count += 1
+        if self.on_result is not None:
+            self.on_result(world_id, success, world_data)
+    
+    def __enter__(self) -> "BulkWorldWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
@@ -0,0 +1,91 @@
+"""
+進捗表示ライブラリ
+"""
+
+import sys
+import time
+from typing import Dict, Optional, TextIO
+
+# 端末以外（ログファイル・CI）に出力する場合の表示間隔（秒）
+DEFAULT_LOG_INTERVAL_SECONDS = 10.0
+# 端末に出力する場合の表示間隔（秒）
+DEFAULT_TTY_INTERVAL_SECONDS = 0.5
+
+
+def format_duration(seconds: float) -> str:
+    """秒数を「1時間2分」「3分4秒」の形式に整形"""
+    seconds = int(max(0, seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}時間{minutes}分"
+    if minutes:
+        return f"{minutes}分{secs}秒"
+    return f"{secs}秒"
+
+
+class ProgressReporter:
+    """処理件数・スループット・残り時間の目安を一定間隔で表示する
+
+    端末では1行を上書きして表示し、それ以外では間隔を空けて1行ずつ出力する。
+    """
+
+    def __init__(self, total: int, stream: Optional[TextIO] = None, interval: Optional[float] = None):
+        self.total = total
+        self.stream = stream or sys.stdout
+        self.is_tty = self.stream.isatty()
+        self.interval = interval if interval is not None else (
+            DEFAULT_TTY_INTERVAL_SECONDS if self.is_tty else DEFAULT_LOG_INTERVAL_SECONDS
+        )
+        self.done = 0
+        self.counts: Dict[str, int] = {}
+        self.started_at = time.monotonic()
+        self._last_shown = 0.0
+        self._shown_done = -1
+        self._line_open = False
+
+    def advance(self, outcome: str) -> None:
+        """1件の処理完了を記録し、表示間隔を過ぎていれば進捗を表示"""
+        self.done += 1
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        now = time.monotonic()
+        if now - self._last_shown >= self.interval or self.done == self.total:
+            self._last_shown = now
+            self.show()
+
+    @property
+    def rate(self) -> float:
+        """1秒あたりの処理件数"""
+        elapsed = time.monotonic() - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def show(self) -> None:
+        """現在の進捗を表示"""
+        percent = self.done / self.total * 100 if self.total else 100.0
+        rate = self.rate
+        remaining = f"残り約{format_duration((self.total - self.done) / rate)}" if rate > 0 else "残り計算中"
+        self._shown_done = self.done
+        counts = ' / '.join(f"{name} {count}" for name, count in self.counts.items())
+        line = f"📈 [{self.done}/{self.total}] {percent:.1f}% | {rate:.1f}件/秒 | {remaining} | {counts}"
+        if self.is_tty:
+            self.stream.write(f"\r\033[K{line}")
+            self._line_open = True
+        else:
+            self.stream.write(f"{line}\n")
+        self.stream.flush()
+
+    def clear_line(self) -> None:
+        """上書き中の進捗行を改行して、他のメッセージと混ざらないようにする"""
+        if self._line_open:
+            self.stream.write("\n")
+            self.stream.flush()
+            self._line_open = False
+
+    def finish(self) -> None:
+        """最終的な進捗と経過時間を表示"""
+        if self._shown_done != self.done:
+            self.show()
+        self.clear_line()
+        elapsed = time.monotonic() - self.started_at
+        self.stream.write(f"⏱️  {self.done}件を{format_duration(elapsed)}で処理しました（平均 {self.rate:.1f}件/秒）\n")
+        self.stream.flush()
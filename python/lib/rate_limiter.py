@@ -0,0 +1,92 @@
+"""
+レート制限ライブラリ
+"""
+
+import time
+import asyncio
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッター
+
+    同期処理（スレッド）と非同期処理（asyncio）の両方から共有して利用できる。
+    """
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second は正の値を指定してください")
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """経過時間に応じてトークンを補充"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def reserve(self) -> float:
+        """トークンを1つ予約し、利用可能になるまでの待ち秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            # 一時停止中は補充開始時刻が未来になっている
+            wait = max(0.0, self._last_refill - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def acquire(self) -> None:
+        """トークンを取得（同期版）"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """トークンを取得（asyncio版）"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """AIMD方式で送信レートを自動調整するレートリミッター
+
+    成功が続く間はレートを加算的に上げ、429/503を受けたらレートを乗算的に下げて
+    Retry-Afterの間は全リクエストを停止する。
+    """
+
+    def __init__(self, rate_per_second: float, min_rate: float = 0.1, max_rate: float = 5.0,
+                 increase_step: float = 0.05, decrease_factor: float = 0.5):
+        super().__init__(rate_per_second, capacity=1.0)
+        self.min_rate = min(min_rate, rate_per_second)
+        self.max_rate = max(max_rate, rate_per_second)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+    def on_success(self) -> None:
+        """正常応答時にレートを加算的に上げる"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """429/503応答時にレートを乗算的に下げ、retry_after秒間は送信を停止する"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            if retry_after and retry_after > 0:
+                resume_at = now + retry_after
+                if resume_at > self._last_refill:
+                    # 停止中は補充せず、再開時刻ちょうどに1件目を送れるようトークン1つから補充を再開する
+                    self._last_refill = resume_at
+                    self._tokens = 1.0
+                return
+            self._tokens = min(self._tokens, 0.0)
@@ -0,0 +1,503 @@
+"""
+生データ保存ストアライブラリ
+
+生データをJSONL形式のセグメントファイルに追記し、ワールドIDごとの
+位置（セグメント番号・オフセット・長さ）をインデックスに記録する。
+取得のたびに新しいバージョンとして追記し、過去のバージョンは
+全体スナップショット（base）と直前のスナップショットからの差分（sdelta）で保持する。
+（以前の形式の前バージョンからの差分（delta）も読み込める）
+"""
+
+import os
+import copy
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, IO, Iterator, Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from . import json_codec
+from .file_hash import hash_file
+
+logger = logging.getLogger(__name__)
+
+STORE_DIRNAME = 'store'
+INDEX_FILENAME = 'index.log'
+LOCK_FILENAME = '.lock'
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.jsonl'
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+DEFAULT_MANIFEST_FILENAME = 'manifest.json'
+LEGACY_PREFIX = 'vrchat_raw_'
+LEGACY_SUFFIX = '.json'
+
+# この件数ごとに全体スナップショットを書き込む
+SNAPSHOT_INTERVAL = 20
+
+# (セグメント番号, オフセット, 長さ)
+Location = Tuple[int, int, int]
+
+_MISSING = object()
+
+
+def diff_records(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """2つのレコードの差分を作成（両方が辞書のフィールドは再帰的に比較）"""
+    diff: Dict[str, Any] = {}
+    changed = {}
+    nested = {}
+    for key, value in new.items():
+        old_value = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            sub_diff = diff_records(old_value, value)
+            if sub_diff:
+                nested[key] = sub_diff
+        elif old_value is _MISSING or old_value != value:
+            changed[key] = value
+    removed = [key for key in old if key not in new]
+    if changed:
+        diff['set'] = changed
+    if removed:
+        diff['unset'] = removed
+    if nested:
+        diff['sub'] = nested
+    return diff
+
+
+def apply_diff(record: Dict[str, Any], diff: Dict[str, Any]) -> Dict[str, Any]:
+    """レコードに差分を適用した新しいレコードを返す"""
+    result = dict(record)
+    for key in diff.get('unset', []):
+        result.pop(key, None)
+    for key, value in diff.get('set', {}).items():
+        result[key] = copy.deepcopy(value)
+    for key, sub_diff in diff.get('sub', {}).items():
+        result[key] = apply_diff(result.get(key) or {}, sub_diff)
+    return result
+
+
+class RawDataStore:
+    """追記専用のセグメント型生データストア
+
+    - 書き込みは現在のセグメント末尾への追記のみで、上限サイズを超えると次のセグメントへ切り替える
+    - インデックスも追記形式で、読み込み時にワールドIDごとのバージョン一覧を再構築する
+    - 各バージョンはSNAPSHOT_INTERVAL件ごとの全体スナップショットと、直前のスナップショットからの差分で保存する
+    - 1件の読み込み・追記時の差分作成は、スナップショットと差分の最大2行の読み込みで済む
+    - 複数プロセスからの同時書き込みに対応するため、追記はストアのロックファイルを排他ロックして行い、
+      ロック中に他のプロセスが追記したインデックスを読み込んでからファイル末尾に書き込む
+    """
+
+    def __init__(self, raw_data_dir: str, segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES):
+        self.raw_data_dir = raw_data_dir
+        self.store_dir = os.path.join(raw_data_dir, STORE_DIRNAME)
+        self.segment_max_bytes = segment_max_bytes
+        # world_id -> 全バージョンの位置（古い順）
+        self._index: Dict[str, List[Location]] = {}
+        self._lock = threading.Lock()
+        self._segment_no = 1
+        self._segment_file: Optional[IO[bytes]] = None
+        self._index_file: Optional[IO[bytes]] = None
+        self._index_pos = 0  # インデックスファイルを読み込み済みの位置
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(self.store_dir, LOCK_FILENAME), 'a+b')
+        index_path = os.path.join(self.store_dir, INDEX_FILENAME)
+        index_exists = os.path.exists(index_path)
+        with self._lock, self._file_lock():
+            self._load_index()
+            self._segment_no = max([self._segment_no] + self._existing_segments())
+        if not index_exists:
+            self._import_legacy_files()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """ストアの排他ロック（他のプロセスの追記が終わるまで待機）"""
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCKは約10秒で諦めるため再試行
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._lock_file.seek(0)
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _segment_path(self, segment_no: int) -> str:
+        return os.path.join(self.store_dir, f"{SEGMENT_PREFIX}{segment_no:06d}{SEGMENT_SUFFIX}")
+
+    def _existing_segments(self) -> List[int]:
+        """既存のセグメント番号一覧（ストアディレクトリのみを参照）"""
+        numbers = []
+        for name in os.listdir(self.store_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return numbers
+
+    def _load_index(self) -> None:
+        """追記形式のインデックスの未読み込み部分を読み込み（ファイルロック中に呼ぶ）
+
+        同じワールドIDの行は古いバージョンから順に並ぶ。ロック中は他のプロセスが書き込んでいないため、
+        改行で終わっていない末尾の行は異常終了で書き込み途中になった行とみなして切り詰める。
+        """
+        index_path = os.path.join(self.store_dir, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'rb') as f:
+            f.seek(self._index_pos)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            logger.warning(f"⚠️ 書き込み途中のインデックス行を削除します: {index_path}")
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
+            os.truncate(index_path, self._index_pos + end)
+        for line in data[:end].decode('utf-8').splitlines():
+            parts = line.split('\t')
+            if len(parts) != 4:
+                continue
+            world_id, segment_no, offset, length = parts
+            self._index.setdefault(world_id, []).append((int(segment_no), int(offset), int(length)))
+            # 他のプロセスが次のセグメントへ切り替えていれば、以降はそちらに書き込む
+            if int(segment_no) > self._segment_no:
+                self._segment_no = int(segment_no)
+                if self._segment_file is not None:
+                    self._segment_file.close()
+                    self._segment_file = None
+        self._index_pos += end
+
+    def _import_legacy_files(self) -> None:
+        """旧形式（1ワールド1ファイル）の生データをストアに取り込み（初回のみ）"""
+        legacy_files = sorted(
+            name for name in os.listdir(self.raw_data_dir)
+            if name.startswith(LEGACY_PREFIX) and name.endswith(LEGACY_SUFFIX)
+        )
+        if legacy_files:
+            logger.info(f"📦 旧形式の生データ{len(legacy_files)}件をストアに取り込みます")
+        for name in legacy_files:
+            try:
+                record = json_codec.load_file(os.path.join(self.raw_data_dir, name))
+                world_id = record.get('world_id') or name[len(LEGACY_PREFIX):-len(LEGACY_SUFFIX)]
+                self.append(world_id, record)
+            except Exception as e:
+                logger.error(f"❌ 旧形式生データ取り込みエラー {name}: {e}")
+        # 旧形式がなくてもインデックスファイルを作成し、取り込み済みとする
+        with self._lock:
+            self._open_index()
+
+    def _open_index(self) -> IO[bytes]:
+        if self._index_file is None:
+            self._index_file = open(os.path.join(self.store_dir, INDEX_FILENAME), 'ab')
+        return self._index_file
+
+    def _open_segment(self) -> IO[bytes]:
+        """書き込み先セグメントを開く（上限サイズを超えていれば次へ切り替え、ファイルロック中に呼ぶ）"""
+        if self._segment_file is None:
+            self._segment_file = open(self._segment_path(self._segment_no), 'ab')
+        # 他のプロセスが追記している場合があるため、書き込み位置を実際の末尾に合わせる
+        self._segment_file.seek(0, os.SEEK_END)
+        if self._segment_file.tell() >= self.segment_max_bytes:
+            self._segment_file.close()
+            self._segment_no += 1
+            self._segment_file = open(self._segment_path(self._segment_no), 'ab')
+            self._segment_file.seek(0, os.SEEK_END)
+        return self._segment_file
+
+    def append(self, world_id: str, record: Dict[str, Any]) -> str:
+        """レコードを新しいバージョンとして追記し、書き込んだセグメントのパスを返す"""
+        return self.append_many([(world_id, record)])[0]
+
+    def append_many(self, records: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """複数のレコードをまとめて追記し、それぞれ書き込んだセグメントのパスを返す（flushは最後に1回）"""
+        with self._lock, self._file_lock():
+            # 他のプロセスの追記を反映してから、最新バージョンを差分の基準にする
+            self._load_index()
+            paths = []
+            for world_id, record in records:
+                versions = self._index.get(world_id, [])
+                entry: Dict[str, Any] = {'t': 'base', 'd': record}
+                if versions and len(versions) % SNAPSHOT_INTERVAL != 0:
+                    # 前バージョンを復元せず、直前のスナップショットとの差分を書き込む
+                    base_version, base_record = self._find_base(versions, len(versions) - 1)
+                    entry = {'t': 'sdelta', 'b': base_version, 'd': diff_records(base_record, record)}
+                line = json_codec.dumps(entry) + b'\n'
+
+                segment_file = self._open_segment()
+                offset = segment_file.tell()
+                segment_file.write(line)
+                location = (self._segment_no, offset, len(line))
+
+                self._open_index().write(f"{world_id}\t{location[0]}\t{location[1]}\t{location[2]}\n".encode('utf-8'))
+                self._index.setdefault(world_id, []).append(location)
+                paths.append(self._segment_path(location[0]))
+            # インデックスが未書き込みのセグメントを指さないよう、セグメントを先に書き出す
+            if self._segment_file is not None:
+                self._segment_file.flush()
+            if self._index_file is not None:
+                self._index_file.flush()
+                self._index_pos = self._index_file.tell()
+            return paths
+
+    def _read_entry(self, location: Location) -> Dict[str, Any]:
+        """指定位置の1行を読み込み（エンベロープのない旧形式の行はスナップショットとして扱う）"""
+        segment_no, offset, length = location
+        if self._segment_file is not None and segment_no == self._segment_no:
+            self._segment_file.flush()
+        with open(self._segment_path(segment_no), 'rb') as f:
+            f.seek(offset)
+            entry = json_codec.loads(f.read(length))
+        if 't' not in entry:
+            return {'t': 'base', 'd': entry}
+        return entry
+
+    def _find_base(self, versions: List[Location], version: int) -> Tuple[int, Dict[str, Any]]:
+        """指定バージョン以前で最も新しいスナップショットの(バージョン, レコード)を取得"""
+        start = version - version % SNAPSHOT_INTERVAL
+        while True:
+            entry = self._read_entry(versions[start])
+            if entry['t'] == 'base' or start == 0:
+                break
+            start -= 1
+        if entry['t'] != 'base':
+            return start, self._reconstruct(versions, start)
+        return start, entry['d']
+
+    def _reconstruct(self, versions: List[Location], version: int) -> Dict[str, Any]:
+        """指定バージョンを復元（スナップショットからの差分は1回、以前の形式の差分は順に適用）"""
+        entry = self._read_entry(versions[version])
+        if entry['t'] == 'base':
+            return entry['d']
+        if entry['t'] == 'sdelta':
+            return apply_diff(self._reconstruct(versions, entry['b']), entry['d'])
+        # 前バージョンからの差分（以前の形式）
+        return apply_diff(self._reconstruct(versions, version - 1), entry['d'])
+
+    def read(self, world_id: str) -> Optional[Dict[str, Any]]:
+        """ワールドIDの最新レコードを読み込み"""
+        return self.read_version(world_id, -1)
+
+    def read_version(self, world_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """指定バージョンのレコードを復元（0が最古、-1が最新）"""
+        with self._lock:
+            versions = self._index.get(world_id)
+            if not versions:
+                return None
+            if version < 0:
+                version += len(versions)
+            if not 0 <= version < len(versions):
+                return None
+            return self._reconstruct(versions, version)
+
+    def latest_timestamp(self, world_id: str) -> Optional[str]:
+        """最新バージョンのtimestampを取得（差分にtimestampが含まれていれば復元せずに最新行のみ読む）"""
+        with self._lock:
+            versions = self._index.get(world_id)
+            if not versions:
+                return None
+            entry = self._read_entry(versions[-1])
+            timestamp = entry['d'].get('timestamp') if entry['t'] == 'base' else entry['d'].get('set', {}).get('timestamp')
+            if timestamp is None and entry['t'] != 'base':
+                timestamp = self._reconstruct(versions, len(versions) - 1).get('timestamp')
+            return timestamp
+
+    def version_count(self, world_id: str) -> int:
+        """保存済みのバージョン数"""
+        with self._lock:
+            return len(self._index.get(world_id, []))
+
+    def iter_versions(self, world_id: str) -> Iterator[Dict[str, Any]]:
+        """全バージョンを古い順に復元しながら返す（メモリ上には常に1バージョンのみ保持）"""
+        with self._lock:
+            versions = list(self._index.get(world_id, []))
+        record: Dict[str, Any] = {}
+        bases: Dict[int, Dict[str, Any]] = {}
+        for version, location in enumerate(versions):
+            with self._lock:
+                entry = self._read_entry(location)
+                if entry['t'] == 'sdelta' and entry['b'] not in bases:
+                    bases = {entry['b']: self._reconstruct(versions, entry['b'])}
+            if entry['t'] == 'base':
+                record = entry['d']
+                bases = {version: record}
+            elif entry['t'] == 'sdelta':
+                record = apply_diff(bases[entry['b']], entry['d'])
+            else:
+                record = apply_diff(record, entry['d'])
+            yield record
+
+    def iter_field_history(self, world_id: str, field: str) -> Iterator[Tuple[Optional[str], Any]]:
+        """フィールドの時系列を(timestamp, 値)で返す（fieldは'raw_data.visits'のようにドット区切り）"""
+        keys = field.split('.')
+        for record in self.iter_versions(world_id):
+            value: Any = record
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+            yield (record.get('timestamp'), value)
+
+    def scan_segments(self) -> Dict[str, Dict[str, Any]]:
+        """os.scandirでセグメントファイルの(mtime, size)を取得"""
+        segments: Dict[str, Dict[str, Any]] = {}
+        with os.scandir(self.store_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.startswith(SEGMENT_PREFIX) and entry.name.endswith(SEGMENT_SUFFIX):
+                    stat = entry.stat()
+                    segments[entry.name] = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        return segments
+
+    def _load_manifest(self, manifest_name: str) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """前回走査時の(セグメント情報, 前回アップロードに失敗したワールドID)を読み込み"""
+        path = os.path.join(self.store_dir, manifest_name)
+        if not os.path.exists(path):
+            return {}, []
+        try:
+            manifest = json_codec.load_file(path)
+        except Exception as e:
+            logger.warning(f"⚠️ マニフェスト読み込みエラー: {e}")
+            return {}, []
+        if 'segments' not in manifest:
+            return manifest, []  # 以前の形式（セグメント情報のみ）
+        return manifest['segments'], manifest.get('pending', [])
+
+    def _save_manifest(self, manifest_name: str, segments: Dict[str, Dict[str, Any]],
+                       previous: Dict[str, Dict[str, Any]], pending: Iterable[str] = ()) -> None:
+        """セグメント情報(path, mtime, size, hash)と処理に失敗したワールドIDをマニフェストに保存
+
+        ハッシュはローテーション済み（以後変更されない）セグメントのみ計算し、
+        サイズと更新日時が変わっていなければ前回の値を引き継ぐ。
+        """
+        active_name = os.path.basename(self._segment_path(self._segment_no))
+        manifest: Dict[str, Dict[str, Any]] = {}
+        for name, info in segments.items():
+            old = previous.get(name, {})
+            unchanged = old.get('mtime') == info['mtime'] and old.get('size') == info['size']
+            digest = old.get('sha256') if unchanged else None
+            if digest is None and name != active_name:
+                digest = hash_file(os.path.join(self.store_dir, name))
+            manifest[name] = {'path': name, **info, 'sha256': digest}
+        path = os.path.join(self.store_dir, manifest_name)
+        temp_path = f"{path}.tmp"
+        json_codec.dump_file({'segments': manifest, 'pending': sorted({world_id for world_id in pending if world_id})}, temp_path)
+        os.replace(temp_path, path)
+
+    def scan_records(self, world_ids: Optional[Iterable[str]] = None, modified_since: Optional[float] = None,
+                     changed_only: bool = False, manifest_name: str = DEFAULT_MANIFEST_FILENAME) -> "RecordScan":
+        """各ワールドの最新レコードを1件ずつ読み込む走査を作成
+
+        - world_ids: 指定したワールドIDのみ（未指定の場合は最終書き込みの新しい順に全件）
+        - modified_since: このUNIX時刻以降に更新されたセグメントにあるレコードのみ
+        - changed_only: 前回commitした時点から追記されたレコードと、前回失敗したワールドのみ
+          （セグメントの(mtime, size)をマニフェストと比較し、増えた範囲だけを対象にする）
+        マニフェストは走査後に呼び出し側がRecordScan.commitで更新する（保存に成功した後にのみ呼ぶ）。
+        """
+        return RecordScan(self, world_ids, modified_since, changed_only, manifest_name)
+
+    def iter_records(self, world_ids: Optional[Iterable[str]] = None, modified_since: Optional[float] = None,
+                     changed_only: bool = False, manifest_name: str = DEFAULT_MANIFEST_FILENAME) -> Iterator[Dict[str, Any]]:
+        """各ワールドの最新レコードを1件ずつ読み込んで返す（マニフェストは更新しない、条件はscan_recordsと同じ）"""
+        return iter(self.scan_records(world_ids, modified_since, changed_only, manifest_name))
+
+    def world_ids(self, newest_first: bool = False) -> List[str]:
+        """保存済みのワールドID一覧（newest_first=Trueで最終書き込みの新しい順）"""
+        with self._lock:
+            if not newest_first:
+                return list(self._index)
+            return sorted(self._index, key=lambda world_id: self._index[world_id][-1][:2], reverse=True)
+
+    def __contains__(self, world_id: str) -> bool:
+        with self._lock:
+            return world_id in self._index
+
+    def close(self) -> None:
+        """開いているファイルを閉じる"""
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
+
+
+class RecordScan:
+    """RawDataStore.scan_recordsの走査
+
+    走査開始時のセグメント情報を保持し、呼び出し側が読み込んだレコードの保存を終えた後に
+    commitでマニフェストを更新する（途中で中断・失敗した場合は次回のchanged_onlyで再び対象になる）。
+    """
+
+    def __init__(self, store: RawDataStore, world_ids: Optional[Iterable[str]], modified_since: Optional[float],
+                 changed_only: bool, manifest_name: str):
+        self.store = store
+        self.world_ids = list(world_ids) if world_ids is not None else None
+        self.modified_since = modified_since
+        self.changed_only = changed_only
+        self.manifest_name = manifest_name
+        self.completed = False  # 最後まで走査したか
+        self._segments = store.scan_segments()
+        self._previous, self._pending = store._load_manifest(manifest_name)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        store = self.store
+        targets = [world_id for world_id in self.world_ids if world_id in store] if self.world_ids is not None \
+            else store.world_ids(newest_first=True)
+        # 前回失敗したワールドはセグメントが変わっていなくても対象にする
+        retry = set(self._pending) if self.changed_only else set()
+
+        for world_id in targets:
+            with store._lock:
+                segment_no, offset, _ = store._index[world_id][-1]
+            name = os.path.basename(store._segment_path(segment_no))
+            info = self._segments.get(name)
+            if info is None:
+                continue
+            if self.modified_since is not None and info['mtime'] < self.modified_since:
+                continue
+            if self.changed_only and world_id not in retry:
+                old = self._previous.get(name)
+                if old and old.get('mtime') == info['mtime'] and old.get('size') == info['size']:
+                    continue
+                if old and offset < old.get('size', 0):
+                    continue
+            record = store.read(world_id)
+            if record is not None:
+                yield record
+        self.completed = True
+
+    def commit(self, failed_world_ids: Iterable[str] = ()) -> bool:
+        """走査した範囲を処理済みとしてマニフェストに保存（failed_world_idsは次回も対象にする）
+
+        絞り込みなし（world_ids・modified_since未指定）で最後まで走査した場合のみ保存し、保存したかを返す。
+        """
+        if not self.completed or self.world_ids is not None or self.modified_since is not None:
+            return False
+        self.store._save_manifest(self.manifest_name, self._segments, self._previous, failed_world_ids)
+        return True
+
+
+_stores: Dict[str, RawDataStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_raw_data_store(raw_data_dir: str) -> RawDataStore:
+    """ディレクトリごとに共有されるストアを取得"""
+    key = os.path.abspath(raw_data_dir)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = RawDataStore(raw_data_dir)
+        return _stores[key]
@@ -0,0 +1,47 @@
+"""
+ワールドデータ更新間隔ライブラリ
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+# 更新間隔の下限・上限
+MIN_REFRESH_INTERVAL = timedelta(hours=24)
+MAX_REFRESH_INTERVAL = timedelta(days=30)
+# VRChatでの最終更新からの経過時間に対する更新間隔の比率（経過時間*10 > 最終アップデート時間）
+REFRESH_INTERVAL_RATIO = 10
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """文字列・datetimeをUTCのdatetimeに変換（タイムゾーン情報がない場合はUTCとして扱い、解析できない場合はNone）"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def compute_next_refresh_at(scraped_at: Any, updated_at: Any = None) -> Optional[datetime]:
+    """次回更新日時を計算
+
+    最終スクレイピング日時から、最低24時間・最長30日の範囲で
+    VRChatでの最終更新からの経過時間の1/10だけ間隔を空ける。
+    scraped_atがない場合はNone（常に更新対象）。
+    """
+    scraped = parse_datetime(scraped_at)
+    if scraped is None:
+        return None
+    updated = parse_datetime(updated_at)
+    if updated is None:
+        return scraped + MIN_REFRESH_INTERVAL
+    interval = (scraped - updated) / REFRESH_INTERVAL_RATIO
+    return scraped + max(MIN_REFRESH_INTERVAL, min(interval, MAX_REFRESH_INTERVAL))
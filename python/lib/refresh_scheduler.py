@@ -0,0 +1,131 @@
+"""
+ワールド更新スケジューラーライブラリ
+"""
+
+import os
+import math
+import heapq
+import time
+import itertools
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import json_codec
+from .refresh_policy import parse_datetime, MAX_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# scraped_atがないワールドの鮮度（最長更新間隔分だけ古いものとして扱う）
+UNKNOWN_STALENESS_HOURS = MAX_REFRESH_INTERVAL.total_seconds() / 3600
+
+
+def refresh_priority(world_doc: Dict[str, Any], now: Optional[datetime] = None) -> float:
+    """更新優先度を計算（最終取得からの経過時間を訪問数・人気度で重み付け）"""
+    now = now or datetime.now(timezone.utc)
+    scraped_at = parse_datetime(world_doc.get('scraped_at'))
+    if scraped_at is None:
+        staleness_hours = UNKNOWN_STALENESS_HOURS
+    else:
+        staleness_hours = max(0.0, (now - scraped_at).total_seconds() / 3600)
+
+    visits = world_doc.get('visits') or 0
+    popularity = world_doc.get('popularity') or 0
+    try:
+        weight = (1 + math.log1p(max(0, int(visits)))) * (1 + max(0, int(popularity)) / 10)
+    except (TypeError, ValueError):
+        weight = 1.0
+    return staleness_hours * weight
+
+
+class RefreshScheduler:
+    """更新優先度の高い順にワールドを取り出すヒープ
+
+    前回の実行で持ち越されたワールドは、新たに対象となったワールドより先に取り出す。
+    """
+
+    def __init__(self, carried_over: Iterable[str] = (), now: Optional[datetime] = None):
+        self.now = now or datetime.now(timezone.utc)
+        self._carried_over = set(carried_over)
+        self._heap: List[Tuple[int, float, int, str, Any]] = []
+        self._sequence = itertools.count()
+
+    def push(self, world_id: str, item: Any, world_doc: Dict[str, Any]) -> None:
+        """ワールドを追加"""
+        tier = 0 if world_id in self._carried_over else 1
+        priority = refresh_priority(world_doc, self.now)
+        heapq.heappush(self._heap, (tier, -priority, next(self._sequence), world_id, item))
+
+    def pop(self) -> Tuple[str, Any]:
+        """最も優先度の高いワールドを(world_id, item)で取り出す"""
+        _, _, _, world_id, item = heapq.heappop(self._heap)
+        return world_id, item
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        """優先度順に取り出しながら(world_id, item)を返す"""
+        while self._heap:
+            yield self.pop()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class RunBudget:
+    """1回の実行で使えるリクエスト数・実行時間の予算（Noneは無制限）
+
+    リクエスト数は実際にAPIへ送信する時点で消費する（並列取得のスレッドから呼ばれる）。
+    """
+
+    def __init__(self, max_requests: Optional[int] = None, max_duration: Optional[float] = None):
+        self.max_requests = max_requests
+        self.max_duration = max_duration
+        self.requests = 0
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """予算を使い切ったかどうか"""
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            return True
+        if self.max_duration is not None and time.monotonic() - self._started_at >= self.max_duration:
+            return True
+        return False
+
+    def consume(self) -> bool:
+        """リクエスト1件分の予算を使用（使い切っている場合はFalse）"""
+        with self._lock:
+            if self.exhausted:
+                return False
+            self.requests += 1
+            return True
+
+
+def load_backlog(path: str) -> List[str]:
+    """前回持ち越したワールドIDを読み込み"""
+    if not os.path.exists(path):
+        return []
+    try:
+        return list(json_codec.load_file(path).get('world_ids', []))
+    except Exception as e:
+        logger.warning(f"⚠️ 持ち越しリスト読み込みエラー: {e}")
+        return []
+
+
+def save_backlog(path: str, world_ids: List[str]) -> None:
+    """持ち越したワールドIDを優先度順に保存（空の場合はファイルを削除）"""
+    try:
+        if not world_ids:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        json_codec.dump_file({
+            'saved_at': datetime.now(timezone.utc).isoformat(),
+            'world_ids': world_ids
+        }, temp_path, indent=True)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.error(f"❌ 持ち越しリスト保存エラー: {e}")
@@ -0,0 +1,140 @@
+"""
+VRChat APIレスポンスキャッシュライブラリ
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL_SECONDS = 24 * 60 * 60  # 24時間
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+
+
+class ResponseCache:
+    """ワールドIDをキーとしたディスクキャッシュ
+
+    TTLを過ぎたエントリはミス扱いとなり、合計サイズが上限を超えると
+    最も長く参照されていないエントリから削除する（LRU）。
+    extensionを'.json.gz'や'.json.zst'にすると圧縮して保存する。
+    """
+
+    def __init__(self, cache_dir: str, ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_CACHE_MAX_BYTES, extension: str = '.json'):
+        self.cache_dir = cache_dir
+        self.extension = extension
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # world_id -> ファイルサイズ（参照順、末尾が最新）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def _path(self, world_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{world_id}{self.extension}")
+
+    def _load_index(self) -> None:
+        """既存のキャッシュファイルを最終参照日時順に索引化"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if (entry.is_file() and entry.name.endswith(self.extension)
+                        and not entry.name.startswith('.')):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-len(self.extension)], stat.st_size))
+        for _, world_id, size in sorted(found):
+            self._entries[world_id] = size
+            self._total_bytes += size
+
+    def get(self, world_id: str) -> Optional[Dict[str, Any]]:
+        """キャッシュからワールドデータを取得（期限切れ・未登録はNone）"""
+        with self._lock:
+            if world_id not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(world_id)
+            try:
+                cached = json_codec.load_file(path)
+            except Exception as e:
+                logger.warning(f"⚠️ キャッシュ読み込みエラー {world_id}: {e}")
+                self._remove(world_id)
+                self.misses += 1
+                return None
+
+            if time.time() - cached.get('cached_at', 0) >= self.ttl_seconds:
+                self._remove(world_id)
+                self.misses += 1
+                return None
+
+            # 参照日時を更新（再起動後もLRU順を保つためファイルのmtimeにも反映）
+            self._entries.move_to_end(world_id)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            return cached.get('data')
+
+    def put(self, world_id: str, world_data: Dict[str, Any]) -> None:
+        """ワールドデータをキャッシュに保存"""
+        with self._lock:
+            try:
+                path = self._path(world_id)
+                # 拡張子で圧縮形式を判定するため、一時ファイルも同じ拡張子にする
+                temp_path = os.path.join(self.cache_dir, f".{world_id}.tmp{self.extension}")
+                json_codec.dump_file({'cached_at': time.time(), 'data': world_data}, temp_path)
+                os.replace(temp_path, path)
+                size = os.path.getsize(path)
+            except Exception as e:
+                logger.warning(f"⚠️ キャッシュ保存エラー {world_id}: {e}")
+                return
+
+            self._total_bytes += size - self._entries.pop(world_id, 0)
+            self._entries[world_id] = size
+            self._evict()
+
+    def _evict(self) -> None:
+        """合計サイズが上限を超えている間、最も古いエントリを削除"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, world_id: str) -> None:
+        """エントリを削除"""
+        self._total_bytes -= self._entries.pop(world_id, 0)
+        try:
+            os.remove(self._path(world_id))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット・ミス数などの統計情報を取得"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes
+            }
+
+
+def create_response_cache(cache_dir: str, ttl_hours: float) -> Optional[ResponseCache]:
+    """APIレスポンスキャッシュを作成（有効期間が0以下の場合はNone）"""
+    if ttl_hours <= 0:
+        return None
+    return ResponseCache(cache_dir, ttl_seconds=ttl_hours * 3600)
@@ -0,0 +1,113 @@
+"""
+ワールド取得リトライキューライブラリ
+"""
+
+import random
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+from .mongodb_manager import MongoDBManager
+
+logger = logging.getLogger(__name__)
+
+RETRY_QUEUE_COLLECTION = 'retry_queue'
+DEFAULT_RETRY_BASE_DELAY_SECONDS = 15 * 60  # 15分
+DEFAULT_RETRY_MAX_DELAY_SECONDS = 24 * 60 * 60  # 24時間
+# この回数連続で失敗したワールドに破損タグを付与する
+DEFAULT_CORRUPT_AFTER_FAILURES = 3
+
+
+class RetryQueue:
+    """取得に失敗したワールドを試行回数・次回試行日時とともにMongoDBに保持するリトライキュー
+
+    待機時間は失敗回数に応じて指数的に延ばし、同時に失敗したワールドが
+    同じ時刻に集中しないようランダムな揺らぎを加える。
+    次回試行日時はワールドのnext_refresh_atにも反映し、それまでは更新対象に選ばれないようにする。
+    """
+
+    def __init__(self, mongodb: MongoDBManager,
+                 base_delay: float = DEFAULT_RETRY_BASE_DELAY_SECONDS,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY_SECONDS):
+        self.mongodb = mongodb
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # キューに登録済みのworld_id -> 失敗回数（load_dueで読み込んだもの・今回の実行で失敗したもの）
+        self._attempts: Dict[str, int] = {}
+
+    def load_due(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """次回試行日時を過ぎたワールドを world_id -> 失敗回数 で取得"""
+        collection = self.mongodb.get_collection(RETRY_QUEUE_COLLECTION)
+        if collection is None:
+            return {}
+        try:
+            now = now or datetime.now(timezone.utc)
+            due = {
+                doc['world_id']: doc.get('attempts', 0)
+                for doc in collection.find({'next_attempt_at': {'$lte': now}}, {'_id': 0, 'world_id': 1, 'attempts': 1})
+            }
+        except Exception as e:
+            logger.error(f"❌ リトライキュー取得エラー: {e}")
+            return {}
+        self._attempts.update(due)
+        return due
+
+    def backoff_delay(self, attempts: int) -> timedelta:
+        """失敗回数に応じた待機時間（指数バックオフ＋揺らぎ）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+    def record_failure(self, world_id: str, error_message: str = "") -> int:
+        """失敗を記録し、連続失敗回数を返す
+
+        失敗回数はキューに保存済みの回数に加算する（load_dueで読み込んでいないワールドも通算する）。
+        """
+        now = datetime.now(timezone.utc)
+        attempts = self._attempts.get(world_id, 0) + 1
+
+        collection = self.mongodb.get_collection(RETRY_QUEUE_COLLECTION)
+        if collection is None:
+            self._attempts[world_id] = attempts
+            return attempts
+        try:
+            doc = collection.find_one_and_update(
+                {'world_id': world_id},
+                {
+                    '$inc': {'attempts': 1},
+                    '$set': {
+                        'last_error': error_message,
+                        'updated_at': now
+                    },
+                    '$setOnInsert': {'created_at': now}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            attempts = doc.get('attempts', attempts) if doc else attempts
+            self._attempts[world_id] = attempts
+            # 待機時間は保存済みの失敗回数から決める
+            next_attempt_at = now + self.backoff_delay(attempts)
+            collection.update_one({'world_id': world_id}, {'$set': {'next_attempt_at': next_attempt_at}})
+            # 次回試行日時までは更新対象に選ばれないようにする
+            self.mongodb.set_next_refresh_at({world_id: next_attempt_at})
+        except Exception as e:
+            logger.error(f"❌ リトライキュー登録エラー ({world_id}): {e}")
+            self._attempts[world_id] = attempts
+        return attempts
+
+    def record_success(self, world_id: str) -> None:
+        """成功したワールドをキューから削除（load_dueで読み込んでいないワールドの登録も削除する）"""
+        self._attempts.pop(world_id, None)
+        collection = self.mongodb.get_collection(RETRY_QUEUE_COLLECTION)
+        if collection is None:
+            return
+        try:
+            collection.delete_one({'world_id': world_id})
+        except Exception as e:
+            logger.error(f"❌ リトライキュー削除エラー ({world_id}): {e}")
+
+    def is_queued(self, world_id: str) -> bool:
+        """今回の実行でキューに登録されていることを確認済みか"""
+        return world_id in self._attempts
@@ -0,0 +1,106 @@
+"""
+更新処理ジャーナルライブラリ
+"""
+
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+# 再開時に処理済みとみなす結果（それ以外は再取得する）
+COMPLETED_OUTCOMES = ('ok', 'not_modified', 'skipped', 'error')
+
+
+class RunJournal:
+    """更新処理の対象リストとワールドごとの処理結果を記録するジャーナル
+
+    1行目に対象リスト、以降に処理結果を1件ずつ追記するJSON Lines形式で、
+    処理が中断された場合は次回の実行で未処理のワールドから再開できる。
+    正常に完了した場合はファイルを削除する。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_id: Optional[str] = None
+        self.cursor = 0  # 記録済みの処理結果の件数
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, str]]]:
+        """中断された実行があれば(対象リスト, world_id -> 処理結果)を返す"""
+        if not os.path.exists(self.path):
+            return None
+        targets: List[Dict[str, Any]] = []
+        outcomes: Dict[str, str] = {}
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            for line in data.splitlines():
+                try:
+                    entry = json_codec.loads(line)
+                except json_codec.DECODE_ERRORS:
+                    # 書き込み途中で中断された末尾の行は無視する
+                    continue
+                if entry.get('type') == 'start':
+                    self.run_id = entry.get('run_id')
+                    targets = entry.get('targets', [])
+                elif entry.get('type') == 'outcome':
+                    outcomes[entry['world_id']] = entry['outcome']
+        except Exception as e:
+            logger.warning(f"⚠️ ジャーナル読み込みエラー: {e}")
+            return None
+        if self.run_id is None:
+            return None
+        self.cursor = len(outcomes)
+        self._file = open(self.path, 'ab')
+        if data and not data.endswith(b'\n'):
+            # 途中で切れた行の後ろに続けて書かないよう改行する
+            self._file.write(b'\n')
+        return targets, outcomes
+
+    def start(self, targets: List[Dict[str, Any]]) -> None:
+        """新しい実行の対象リストを記録"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.run_id = uuid.uuid4().hex
+        self.cursor = 0
+        self._file = open(self.path, 'wb')
+        self._write({
+            'type': 'start',
+            'run_id': self.run_id,
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'targets': targets
+        })
+
+    def record(self, world_id: str, outcome: str) -> None:
+        """ワールドの処理結果を追記"""
+        with self._lock:
+            if self._file is None:
+                return
+            self.cursor += 1
+            self._write({'type': 'outcome', 'world_id': world_id, 'outcome': outcome, 'cursor': self.cursor})
+
+    def complete(self) -> None:
+        """実行の完了を記録（ジャーナルを削除）"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        """ジャーナルファイルを閉じる（中断時は内容を残す）"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        """1行追記して即座にディスクへ書き出す"""
+        self._file.write(json_codec.dumps(entry) + b'\n')
+        self._file.flush()
@@ -0,0 +1,116 @@
+"""
+ワールドタグ一括書き込みライブラリ
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from pymongo import UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+
+from .mongodb_manager import MongoDBManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAG_BATCH_SIZE = 500
+
+# 一意インデックスの重複エラー（他のプロセスが同時に同じリレーションを作成した場合）
+DUPLICATE_KEY_ERROR = 11000
+
+
+class TagWriter:
+    """ワールドへのタグ付与・削除を溜め、worlds と worlds_tag にbulk_writeでまとめて書き込むライター
+
+    タグIDはsystem_taglistから実行ごとに1回だけ解決する。
+    同じワールド・タグへの操作は最後の操作のみを書き込む。
+    worlds_tagは(worldId, tagId)の一意インデックスを前提にupsertするため、事前の存在確認は行わない。
+    """
+
+    def __init__(self, mongodb: MongoDBManager, batch_size: int = DEFAULT_TAG_BATCH_SIZE):
+        self.mongodb = mongodb
+        self.batch_size = batch_size
+        self.added_count = 0
+        self.removed_count = 0
+        self._tag_ids: Dict[str, Optional[str]] = {}
+        # (world_id, tag_name) -> 'add' / 'remove'
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def resolve_tag_id(self, tag_name: str) -> Optional[str]:
+        """タグ名からsystem_taglistのタグIDを取得（実行中はキャッシュ）"""
+        if tag_name in self._tag_ids:
+            return self._tag_ids[tag_name]
+        system_tags_collection = self.mongodb.get_collection('system_taglist')
+        if system_tags_collection is None:
+            return None
+        tag_doc = system_tags_collection.find_one({'tagName': tag_name}, {'_id': 1})
+        tag_id = str(tag_doc['_id']) if tag_doc else None
+        if tag_id is None:
+            logger.warning(f"⚠️ タグがsystem_taglistに存在しません: {tag_name}")
+        self._tag_ids[tag_name] = tag_id
+        return tag_id
+
+    def add(self, world_id: str, tag_name: str) -> None:
+        """タグの付与を登録"""
+        self._enqueue(world_id, tag_name, 'add')
+
+    def remove(self, world_id: str, tag_name: str) -> None:
+        """タグの削除を登録"""
+        self._enqueue(world_id, tag_name, 'remove')
+
+    def _enqueue(self, world_id: str, tag_name: str, action: str) -> None:
+        with self._lock:
+            self._pending[(world_id, tag_name)] = action
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """溜まっているタグ操作を書き込み"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        if not pending:
+            return
+
+        world_operations = []
+        relation_operations = []
+        for (world_id, tag_name), action in pending.items():
+            tag_id = self.resolve_tag_id(tag_name)
+            if tag_id is None:
+                continue
+            relation = {'worldId': world_id, 'tagId': tag_id}
+            if action == 'add':
+                world_operations.append(UpdateOne({'world_id': world_id}, {'$addToSet': {'tags': tag_name}}))
+                relation_operations.append(UpdateOne(
+                    relation, {'$setOnInsert': {**relation, 'createdAt': datetime.now()}}, upsert=True
+                ))
+            else:
+                world_operations.append(UpdateOne({'world_id': world_id}, {'$pull': {'tags': tag_name}}))
+                relation_operations.append(DeleteOne(relation))
+
+        self._bulk_write('worlds', world_operations)
+        result = self._bulk_write('worlds_tag', relation_operations)
+        if result is not None:
+            self.added_count += result.get('nUpserted', 0)
+            self.removed_count += result.get('nRemoved', 0)
+
+    def _bulk_write(self, collection_name: str, operations: list) -> Optional[Dict[str, Any]]:
+        """順序なしbulk_writeを実行し、結果の集計を返す"""
+        if not operations:
+            return None
+        collection = self.mongodb.get_collection(collection_name)
+        if collection is None:
+            logger.warning(f"⚠️ {collection_name}コレクションにアクセスできません")
+            return None
+        try:
+            return collection.bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            errors = [error for error in e.details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY_ERROR]
+            if errors:
+                logger.error(f"❌ タグ一括書き込みエラー ({collection_name}): {len(errors)}件が失敗")
+            return e.details
+        except Exception as e:
+            logger.error(f"❌ タグ一括書き込みエラー ({collection_name}): {e}")
+            return None
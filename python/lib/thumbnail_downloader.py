@@ -0,0 +1,83 @@
+"""
+サムネイル並列ダウンロードライブラリ
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional, Tuple
+
+from .vrchat_scraper import VRChatWorldScraper
+from .thumbnail_manifest import ThumbnailManifest
+from .thumbnail_variants import PIL_AVAILABLE, generate_thumbnail_variants, has_all_variants
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THUMBNAIL_WORKERS = 4
+
+
+class ThumbnailDownloader:
+    """API取得処理とは別のワーカープールでサムネイルをダウンロードするクラス
+
+    submit()は待ち件数が上限に達するとブロックするため、メモリ使用量は一定に保たれる。
+    取得元URLと内容ハッシュはマニフェストに記録し、変更された画像のみ再ダウンロードする。
+    ダウンロード後はサイズ別のWebP派生画像も生成する（Pillowが必要）。
+    """
+
+    def __init__(self, scraper: VRChatWorldScraper, output_dir: str,
+                 max_workers: int = DEFAULT_THUMBNAIL_WORKERS, max_pending: Optional[int] = None,
+                 generate_variants: bool = True):
+        self.scraper = scraper
+        self.output_dir = output_dir
+        self.manifest = ThumbnailManifest(output_dir)
+        self.generate_variants = generate_variants and PIL_AVAILABLE
+        if generate_variants and not PIL_AVAILABLE:
+            logger.warning("⚠️ Pillowが未インストールのため派生画像の生成をスキップします")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self._slots = threading.BoundedSemaphore(max_pending or max_workers * 2)
+        self._lock = threading.Lock()
+        self.results: Dict[str, int] = {'downloaded': 0, 'skipped': 0, 'error': 0}
+
+    def submit(self, world_data: Dict[str, Any]) -> Future:
+        """サムネイルのダウンロードを登録"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._process, world_data)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _process(self, world_data: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """サムネイルをダウンロードし、必要に応じて派生画像を生成"""
+        result = self.scraper.download_thumbnail(world_data, self.output_dir, self.manifest)
+        if self.generate_variants and result and result[0] in ('downloaded', 'skipped'):
+            thumbnail_path = result[1]
+            if result[0] == 'downloaded' or not has_all_variants(thumbnail_path):
+                generate_thumbnail_variants(thumbnail_path)
+        return result
+
+    def _on_done(self, future: Future) -> None:
+        """ダウンロード完了時に結果を集計"""
+        self._slots.release()
+        try:
+            result: Optional[Tuple[str, str]] = future.result()
+            status = result[0] if result else 'error'
+        except Exception as e:
+            logger.error(f"❌ サムネイルワーカーエラー: {e}")
+            status = 'error'
+        with self._lock:
+            self.results[status] = self.results.get(status, 0) + 1
+
+    def close(self) -> Dict[str, int]:
+        """残りのダウンロード完了を待って集計結果を返す"""
+        self._executor.shutdown(wait=True)
+        self.manifest.save()
+        return dict(self.results)
+
+    def __enter__(self) -> 'ThumbnailDownloader':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
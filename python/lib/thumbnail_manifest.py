@@ -0,0 +1,73 @@
+"""
+サムネイルマニフェストライブラリ
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# この件数の変更ごとにマニフェストを書き出す
+AUTO_SAVE_INTERVAL = 100
+
+
+class ThumbnailManifest:
+    """ワールドごとのサムネイル取得元URL・ETag・内容ハッシュを記録するマニフェスト"""
+
+    def __init__(self, thumbnail_dir: str):
+        self.path = os.path.join(thumbnail_dir, MANIFEST_FILENAME)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._load()
+
+    def _load(self) -> None:
+        """マニフェストファイルを読み込み"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            self._entries = json_codec.load_file(self.path)
+        except Exception as e:
+            logger.error(f"❌ サムネイルマニフェスト読み込みエラー: {e}")
+            self._entries = {}
+
+    def get(self, world_id: str) -> Optional[Dict[str, Any]]:
+        """ワールドのエントリを取得"""
+        with self._lock:
+            entry = self._entries.get(world_id)
+            return dict(entry) if entry else None
+
+    def update(self, world_id: str, url: str, etag: Optional[str], sha256: Optional[str]) -> None:
+        """ワールドのエントリを更新"""
+        with self._lock:
+            self._entries[world_id] = {
+                'url': url,
+                'etag': etag,
+                'sha256': sha256,
+                'updated_at': datetime.now(timezone.utc).isoformat()
+            }
+            self._dirty += 1
+            should_save = self._dirty >= AUTO_SAVE_INTERVAL
+        if should_save:
+            self.save()
+
+    def save(self) -> None:
+        """マニフェストを一時ファイル経由で書き出し"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                temp_path = f"{self.path}.tmp"
+                json_codec.dump_file(self._entries, temp_path)
+                os.replace(temp_path, self.path)
+                self._dirty = 0
+            except Exception as e:
+                logger.error(f"❌ サムネイルマニフェスト保存エラー: {e}")
@@ -0,0 +1,78 @@
+"""
+サムネイル派生画像生成ライブラリ
+"""
+
+import os
+import logging
+import tempfile
+from typing import Dict, List
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 派生画像の種類と最大幅（px）
+THUMBNAIL_VARIANTS: Dict[str, int] = {
+    'list': 240,
+    'card': 480,
+    'detail': 1024,
+}
+WEBP_QUALITY = 80
+
+
+def variant_path(thumbnail_path: str, variant: str) -> str:
+    """派生画像のパスを取得（例: thumbnail/wrld_xxx_card.webp）"""
+    stem, _ = os.path.splitext(thumbnail_path)
+    return f"{stem}_{variant}.webp"
+
+
+def has_all_variants(thumbnail_path: str) -> bool:
+    """全ての派生画像が元画像より新しい状態で存在するか確認"""
+    try:
+        source_mtime = os.path.getmtime(thumbnail_path)
+        return all(
+            os.path.exists(variant_path(thumbnail_path, variant))
+            and os.path.getmtime(variant_path(thumbnail_path, variant)) >= source_mtime
+            for variant in THUMBNAIL_VARIANTS
+        )
+    except OSError:
+        return False
+
+
+def generate_thumbnail_variants(thumbnail_path: str) -> List[str]:
+    """元画像からサイズ別のWebP派生画像を生成し、生成したパスのリストを返す"""
+    if not PIL_AVAILABLE:
+        logger.warning("⚠️ Pillowが未インストールのため派生画像の生成をスキップします")
+        return []
+
+    generated: List[str] = []
+    try:
+        with Image.open(thumbnail_path) as source:
+            image = source.convert('RGB')
+        output_dir = os.path.dirname(thumbnail_path)
+        for variant, max_width in THUMBNAIL_VARIANTS.items():
+            resized = image.copy()
+            if resized.width > max_width:
+                height = round(resized.height * max_width / resized.width)
+                resized = resized.resize((max_width, height), Image.LANCZOS)
+
+            # 一時ファイルに書き出してからリネーム
+            output_path = variant_path(thumbnail_path, variant)
+            fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    resized.save(f, 'WEBP', quality=WEBP_QUALITY, method=6)
+                os.replace(temp_path, output_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            generated.append(output_path)
+        return generated
+    except Exception as e:
+        logger.error(f"❌ 派生画像生成エラー {thumbnail_path}: {e}")
+        return generated
@@ -3,10 +3,14 @@
 """
 
 import os
-import json
+import re
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple, Set, Container
+
+from . import json_codec
+from .raw_data_store import get_raw_data_store, RecordScan
 
 logger = logging.getLogger(__name__)
 
@@ -20,85 +24,213 @@ def setup_logging(level=logging.INFO):
         ]
     )
 
-def load_world_urls(file_path: str) -> List[str]:
-    """ワールドURLリストを読み込み"""
+WORLD_ID_PATTERN = re.compile(r'^wrld_[0-9A-Za-z-]+$')
+WORLD_URL_TEMPLATE = 'https://vrchat.com/home/world/{world_id}'
+# ワールドURLとして受け付けるホスト（サブドメインを含む）
+WORLD_URL_HOST = 'vrchat.com'
+
+def normalize_world_id(entry: str) -> Optional[str]:
+    """ワールドURL・launch URL・ワールドIDを正規のワールドID（wrld_...）に変換（URLはvrchat.comのみ）"""
+    entry = entry.strip()
+    if WORLD_ID_PATTERN.match(entry):
+        return entry
+    try:
+        # スキームを省略したURL（vrchat.com/home/world/...）も受け付ける
+        parts = urlsplit(entry if '://' in entry else f"https://{entry}")
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return None
+    if host != WORLD_URL_HOST and not host.endswith(f".{WORLD_URL_HOST}"):
+        return None
+    # https://vrchat.com/home/launch?worldId=wrld_...&instanceId=...
+    for world_id in parse_qs(parts.query).get('worldId', []):
+        if WORLD_ID_PATTERN.match(world_id):
+            return world_id
+    # https://vrchat.com/home/world/wrld_.../info
+    segments = [segment for segment in parts.path.split('/') if segment]
+    for i, segment in enumerate(segments[:-1]):
+        if segment == 'world' and WORLD_ID_PATTERN.match(segments[i + 1]):
+            return segments[i + 1]
+    return None
+
+def world_url(world_id: str) -> str:
+    """ワールドIDからワールドページのURLを生成"""
+    return WORLD_URL_TEMPLATE.format(world_id=world_id)
+
+def iter_world_ids(file_path: str, exclude: Optional[Container[str]] = None) -> Iterator[str]:
+    """ワールドURLリストを1行ずつ読み、重複と除外対象を除いたワールドIDを返す
+
+    excludeにはMongoDBに登録済みのワールドIDなど、取得不要なIDの集合を渡す。
+    """
+    seen: Set[str] = set()
+    invalid_count = 0
+    duplicate_count = 0
+    excluded_count = 0
     try:
         with open(file_path, 'r', encoding='utf-8-sig') as f:
-            urls = [
-                line.strip() 
-                for line in f 
-                if line.strip() and line.strip().startswith('https://vrchat.com/home/world/')
-            ]
-        logger.info(f"📁 {len(urls)} 件のURLを読み込み: {file_path}")
-        return urls
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                world_id = normalize_world_id(line)
+                if not world_id:
+                    invalid_count += 1
+                    continue
+                if world_id in seen:
+                    duplicate_count += 1
+                    continue
+                seen.add(world_id)
+                if exclude is not None and world_id in exclude:
+                    excluded_count += 1
+                    continue
+                yield world_id
     except FileNotFoundError:
         logger.error(f"❌ ファイルが見つかりません: {file_path}")
-        return []
+        return
     except Exception as e:
         logger.error(f"❌ ファイル読み込みエラー: {e}")
-        return []
+        return
+    logger.info(
+        f"📁 {len(seen) - excluded_count} 件のワールドIDを読み込み: {file_path} "
+        f"(重複 {duplicate_count}件 / 登録済み {excluded_count}件 / 無効 {invalid_count}件を除外)"
+    )
+
+def load_world_urls(file_path: str, exclude: Optional[Container[str]] = None) -> List[str]:
+    """ワールドURLリストを読み込み、重複を除いた正規化済みURLを返す"""
+    return [world_url(world_id) for world_id in iter_world_ids(file_path, exclude)]
+
+def _format_raw_record(world_data: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """生データを保存形式に整形し、(world_id, レコード)を返す"""
+    # world_idはworld_data.get('id')またはworld_data.get('world_id')で取得
+    world_id = world_data.get('id') or world_data.get('world_id')
+    if not world_id:
+        return None
+    return world_id, {
+        'timestamp': datetime.now().isoformat(),
+        'world_id': world_id,
+        'source': 'vrchat_api',
+        'raw_data': world_data
+    }
 
 def save_raw_data(world_data: Dict[str, Any], output_dir: str) -> Optional[str]:
-    """生データをJSONファイルに保存"""
+    """生データをセグメント型ストアに追記保存し、書き込み先のパスを返す"""
     try:
-        # world_idはworld_data.get('id')またはworld_data.get('world_id')で取得
-        world_id = world_data.get('id') or world_data.get('world_id')
-        if not world_id:
+        formatted = _format_raw_record(world_data)
+        if formatted is None:
             return None
+        world_id, formatted_data = formatted
 
-        # ディレクトリ作成
-        os.makedirs(output_dir, exist_ok=True)
-
-        # ファイル名生成（world_idのみで一意に）
-        filename = f"vrchat_raw_{world_id}.json"
-        filepath = os.path.join(output_dir, filename)
-
-        # データ整形
-        formatted_data = {
-            'timestamp': datetime.now().isoformat(),
-            'world_id': world_id,
-            'source': 'vrchat_api',
-            'raw_data': world_data
-        }
-
-        # ファイル保存（上書き）
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(formatted_data, f, ensure_ascii=False, indent=2)
+        # セグメントファイルへ追記（ワールドIDごとの最新位置はインデックスで管理）
+        filepath = get_raw_data_store(output_dir).append(world_id, formatted_data)
 
-        logger.info(f"💾 生データ保存: {filename}")
+        logger.info(f"💾 生データ保存: {world_id}")
         return filepath
 
     except Exception as e:
         logger.error(f"❌ 生データ保存エラー: {e}")
         return None
 
+def save_raw_data_many(world_data_list: List[Dict[str, Any]], output_dir: str) -> int:
+    """複数の生データをまとめてストアに追記保存し、保存した件数を返す"""
+    try:
+        records = [formatted for formatted in map(_format_raw_record, world_data_list) if formatted is not None]
+        if not records:
+            return 0
+        get_raw_data_store(output_dir).append_many(records)
+        logger.info(f"💾 生データ保存: {len(records)}件")
+        return len(records)
+
+    except Exception as e:
+        logger.error(f"❌ 生データ一括保存エラー: {e}")
+        return 0
+
+def find_fresh_raw_data(raw_data_dir: str, world_ids: Iterable[str], max_age_seconds: float) -> Set[str]:
+    """生データの最終保存からmax_age_seconds以内のワールドIDを取得"""
+    if not os.path.exists(raw_data_dir):
+        return set()
+    store = get_raw_data_store(raw_data_dir)
+    # 生データのtimestampはローカル時刻で保存している
+    threshold = datetime.now() - timedelta(seconds=max_age_seconds)
+    fresh: Set[str] = set()
+    for world_id in world_ids:
+        try:
+            timestamp = store.latest_timestamp(world_id)
+            if not timestamp:
+                continue
+            saved_at = datetime.fromisoformat(timestamp)
+            if saved_at.tzinfo is not None:
+                saved_at = saved_at.astimezone().replace(tzinfo=None)
+            if saved_at >= threshold:
+                fresh.add(world_id)
+        except Exception as e:
+            logger.warning(f"⚠️ 生データの保存日時取得エラー ({world_id}): {e}")
+    return fresh
+
 def load_raw_data_files(raw_data_dir: str) -> List[str]:
-    """生データファイル一覧を取得"""
+    """保存済みの生データ一覧（ワールドID）を新しい順に取得"""
     try:
         if not os.path.exists(raw_data_dir):
             logger.warning(f"⚠️ 生データディレクトリが見つかりません: {raw_data_dir}")
             return []
         
-        files = [
-            f for f in os.listdir(raw_data_dir) 
-            if f.startswith('vrchat_raw_') and f.endswith('.json')
-        ]
-        files.sort(reverse=True)  # 新しい順
-        return files
+        # ディレクトリを走査せずストアのインデックスから取得
+        return get_raw_data_store(raw_data_dir).world_ids(newest_first=True)
     except Exception as e:
         logger.error(f"❌ ファイル一覧取得エラー: {e}")
         return []
 
 def load_raw_data_file(file_path: str) -> Optional[Dict[str, Any]]:
-    """生データファイルを読み込み"""
+    """生データを読み込み
+
+    file_pathが旧形式のJSONファイルであればそのまま読み込み、
+    それ以外は「生データディレクトリ/ワールドID」としてストアから読み込む。
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if os.path.isfile(file_path):
+            # 拡張子が .gz / .zst の場合は自動で展開
+            return json_codec.load_file(file_path)
+        
+        raw_data_dir, world_id = os.path.split(file_path)
+        data = get_raw_data_store(raw_data_dir or '.').read(world_id)
+        if data is None:
+            logger.error(f"❌ 生データが見つかりません: {file_path}")
         return data
     except Exception as e:
         logger.error(f"❌ ファイル読み込みエラー {file_path}: {e}")
         return None
 
+def iter_raw_data(raw_data_dir: str, world_ids: Optional[Iterable[str]] = None,
+                  modified_since: Optional[datetime] = None, changed_only: bool = False) -> Iterator[Dict[str, Any]]:
+    """生データを1件ずつ遅延読み込みで返す（各ワールドの最新バージョン）
+
+    changed_only=Trueの場合は、前回マニフェストを更新した時点から追記されたレコードのみを返す。
+    マニフェストは更新しないため、保存後に更新する場合はscan_raw_dataを使う。
+    """
+    if not os.path.exists(raw_data_dir):
+        logger.warning(f"⚠️ 生データディレクトリが見つかりません: {raw_data_dir}")
+        return iter(())
+    since = modified_since.timestamp() if modified_since else None
+    return get_raw_data_store(raw_data_dir).iter_records(world_ids, since, changed_only)
+
+def scan_raw_data(raw_data_dir: str, changed_only: bool = False) -> Optional[RecordScan]:
+    """全ワールドの生データを走査するRecordScanを作成（保存に成功した後にcommitでマニフェストを更新する）"""
+    if not os.path.exists(raw_data_dir):
+        logger.warning(f"⚠️ 生データディレクトリが見つかりません: {raw_data_dir}")
+        return None
+    return get_raw_data_store(raw_data_dir).scan_records(changed_only=changed_only)
+
+def load_raw_data_version(raw_data_dir: str, world_id: str, version: int = -1) -> Optional[Dict[str, Any]]:
+    """生データの指定バージョンを復元（0が最古、-1が最新）"""
+    try:
+        return get_raw_data_store(raw_data_dir).read_version(world_id, version)
+    except Exception as e:
+        logger.error(f"❌ 生データ復元エラー {world_id} (version={version}): {e}")
+        return None
+
+def iter_raw_data_field_history(raw_data_dir: str, world_id: str, field: str) -> Iterator[Tuple[Optional[str], Any]]:
+    """生データのフィールドの時系列を(timestamp, 値)で返す（例: field='raw_data.visits'）"""
+    return get_raw_data_store(raw_data_dir).iter_field_history(world_id, field)
+
 def ensure_directory(directory: str):
     """ディレクトリが存在しない場合は作成"""
     os.makedirs(directory, exist_ok=True)
@@ -3,71 +3,302 @@ VRChat ワールドスクレイピングライブラリ
 """
 
 import os
-import json
+import queue
+import hashlib
+import asyncio
 import logging
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple, Iterable, Iterator
+
+from . import json_codec
+from .rate_limiter import AdaptiveRateLimiter
+from .thumbnail_manifest import ThumbnailManifest
+from .file_hash import hash_file
+from .response_cache import ResponseCache
+from .circuit_breaker import CircuitBreaker
+from .refresh_scheduler import RunBudget
+from .utils import normalize_world_id
 
 logger = logging.getLogger(__name__)
 
+# 非同期エンジンのデフォルト設定
+DEFAULT_RATE_PER_SECOND = 1.0
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RATE_PER_SECOND = 5.0
+
+# レート制限応答時の設定
+THROTTLE_STATUS_CODES = (429, 503)
+DEFAULT_RETRY_AFTER_SECONDS = 10.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+# サムネイルのストリーミング書き込み単位
+THUMBNAIL_CHUNK_SIZE = 64 * 1024
+
+# 非同期エンジンの終了通知用
+_ENGINE_DONE = object()
+
 class VRChatWorldScraper:
     """VRChatワールドスクレイピングクラス"""
     
-    def __init__(self):
+    def __init__(self, rate_per_second: float = DEFAULT_RATE_PER_SECOND, max_connections: int = 10,
+                 max_rate_per_second: float = DEFAULT_MAX_RATE_PER_SECOND,
+                 cache: Optional[ResponseCache] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 request_budget: Optional[RunBudget] = None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
         })
+        # 並列取得時にコネクションを使い回せるようプールサイズを設定
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount('https://', adapter)
+        # 全リクエストで共有するレートリミッター（応答に応じてAIMDで自動調整）
+        self.rate_limiter = AdaptiveRateLimiter(rate_per_second, max_rate=max_rate_per_second)
+        # APIレスポンスのディスクキャッシュ（Noneの場合は毎回APIに問い合わせる）
+        self.cache = cache
+        # API障害時に連続タイムアウトを避けるためのサーキットブレーカー
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # APIリクエスト数の予算（送信のたびに消費し、Noneの場合は無制限）
+        self.request_budget = request_budget
         
     def scrape_world_by_url(self, url: str) -> Optional[Dict[str, Any]]:
         """URLからワールド情報をスクレイピング"""
+        _, world_data = self.fetch_world(url)
+        return world_data
+
+    def fetch_world(self, url: str, validators: Optional[Dict[str, Any]] = None,
+                    max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """URLからワールド情報を取得。(status, world_data)を返す
+
+        statusは'ok'、'not_modified'（前回取得から変更なし）、'rate_limited'（再試行上限まで制限された）、
+        'circuit_open'（API障害中のため未送信）、'over_budget'（リクエスト数の予算切れのため未送信）、'error'のいずれか。
+        validatorsに前回のhttp_etag/http_last_modifiedを渡すと条件付きリクエストになる。
+        レート制限時はRetry-Afterに従って待機してから再試行する。
+        キャッシュに有効なデータがあればAPIに問い合わせず_from_cache=Trueのデータを返す。
+        """
+        return self._fetch(url, validators, max_attempts)
+
+    def _fetch(self, url: str, validators: Optional[Dict[str, Any]] = None,
+               max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+               stop_event: Optional[threading.Event] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """fetch_worldと並列取得で共通の取得処理（ID確認・キャッシュ確認・サーキット確認・レート制限時の再試行）
+
+        stop_eventがセットされた場合はレート制限時の再試行を打ち切る。
+        """
+        if not self._extract_world_id(url):
+            logger.error(f"❌ ワールドIDの抽出に失敗: {url}")
+            return ('error', None)
+        
+        # キャッシュヒット時はレート制限のトークンを消費しない
+        cached = self._get_cached(url)
+        if cached:
+            return ('ok', cached)
+        
+        status, world_data = 'rate_limited', None
+        for _ in range(max(1, max_attempts)):
+            # 遮断中はトークンを消費せず即座に失敗させる
+            if not self.circuit_breaker.allow_request():
+                return ('circuit_open', None)
+            # 予算はキャッシュヒットでは使わず、再試行を含めて実際に送信するリクエストごとに使う
+            if self.request_budget is not None and not self.request_budget.consume():
+                return ('over_budget', None)
+            self.rate_limiter.acquire()
+            status, world_data = self._request_world(url, validators)
+            if status != 'rate_limited' or (stop_event is not None and stop_event.is_set()):
+                break
+        return (status, world_data)
+
+    def _request_world(self, url: str, validators: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """VRChat APIに1回だけリクエストを送信"""
         try:
             # ワールドIDを抽出
             world_id = self._extract_world_id(url)
             if not world_id:
                 logger.error(f"❌ ワールドIDの抽出に失敗: {url}")
-                return None
+                return ('error', None)
             
             # VRChat APIエンドポイント
             api_url = f"https://api.vrchat.cloud/api/1/worlds/{world_id}"
             
-            response = self.session.get(api_url, timeout=30)
+            # 前回のETag/Last-Modifiedがあれば条件付きリクエストにする
+            headers: Dict[str, str] = {}
+            if validators:
+                if validators.get('http_etag'):
+                    headers['If-None-Match'] = validators['http_etag']
+                if validators.get('http_last_modified'):
+                    headers['If-Modified-Since'] = validators['http_last_modified']
+            
+            response = self.session.get(api_url, headers=headers, timeout=30)
+            # 5xx（503はレート制限として扱う）以外の応答はAPIが稼働している証拠
+            if response.status_code >= 500 and response.status_code not in THROTTLE_STATUS_CODES:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            if response.status_code == 304:
+                self.rate_limiter.on_success()
+                return ('not_modified', None)
+            if response.status_code in THROTTLE_STATUS_CODES:
+                retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+                self.rate_limiter.on_throttle(retry_after)
+                logger.warning(f"⏳ レート制限 ({response.status_code}) {url}: {retry_after:.0f}秒待機")
+                return ('rate_limited', None)
             response.raise_for_status()
+            self.rate_limiter.on_success()
             
-            world_data = response.json()
+            world_data = json_codec.loads(response.content)
             
             # 追加情報を付与 (UTCでタイムスタンプを記録)
             world_data['scraped_at'] = datetime.now(timezone.utc).isoformat()
             world_data['source_url'] = url
             world_data['_from_cache'] = False  # 新規取得データ
+            # 次回の条件付きリクエスト用に検証子を保持
+            world_data['http_etag'] = response.headers.get('ETag')
+            world_data['http_last_modified'] = response.headers.get('Last-Modified')
+            
+            if self.cache is not None:
+                self.cache.put(world_id, world_data)
             
-            return world_data
+            return ('ok', world_data)
             
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"❌ API取得エラー {url}: {e}")
+            return ('error', None)
         except requests.exceptions.RequestException as e:
+            # タイムアウト・接続エラーはAPI障害として記録
+            self.circuit_breaker.record_failure()
             logger.error(f"❌ API取得エラー {url}: {e}")
-            return None
-        except json.JSONDecodeError as e:
+            return ('error', None)
+        except json_codec.DECODE_ERRORS as e:
             logger.error(f"❌ JSON解析エラー {url}: {e}")
-            return None
-            return None
+            return ('error', None)
         except Exception as e:
             logger.error(f"❌ 予期しないエラー {url}: {e}")
+            return ('error', None)
+
+    def _get_cached(self, url: str) -> Optional[Dict[str, Any]]:
+        """キャッシュから有効なワールドデータを取得"""
+        if self.cache is None:
             return None
-    
-    def _extract_world_id(self, url: str) -> Optional[str]:
-        """URLからワールドIDを抽出"""
-        try:
-            if '/world/' in url:
-                world_id = url.split('/world/')[-1].split('/')[0].split('?')[0]
-                if world_id.startswith('wrld_'):
-                    return world_id
+        world_id = self._extract_world_id(url)
+        if not world_id:
             return None
-        except Exception:
+        cached = self.cache.get(world_id)
+        if not cached:
             return None
+        return {**cached, '_from_cache': True}
+
+    def _parse_retry_after(self, value: Optional[str]) -> float:
+        """Retry-Afterヘッダー（秒数またはHTTP日付）を待機秒数に変換"""
+        if not value:
+            return DEFAULT_RETRY_AFTER_SECONDS
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER_SECONDS
+
+    def fetch_many(self, urls: Iterable[str], concurrency: int = 1,
+                   validators: Optional[Dict[str, Dict[str, Any]]] = None,
+                   max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Iterator[Tuple[str, str, Optional[Dict[str, Any]]]]:
+        """複数URLのワールドデータを取得し(url, status, world_data)を返す。concurrencyが2以上なら並列取得"""
+        validators = validators or {}
+        if concurrency > 1:
+            yield from self.scrape_worlds(urls, concurrency, validators, max_attempts)
+            return
+        
+        # リクエスト間隔はレートリミッターが制御する
+        for url in urls:
+            status, world_data = self.fetch_world(url, validators.get(url), max_attempts)
+            yield (url, status, world_data)
+
+    def scrape_worlds(self, urls: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                      validators: Optional[Dict[str, Dict[str, Any]]] = None,
+                      max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Iterator[Tuple[str, str, Optional[Dict[str, Any]]]]:
+        """複数URLを非同期エンジンで並列取得し、完了順に(url, status, world_data)を返す
+
+        同時実行数はconcurrencyで、リクエスト頻度は共有のレートリミッターで制限する。
+        レート制限されたリクエストはRetry-After経過後にmax_attempts回まで再試行される。
+        validatorsはURLごとの条件付きリクエスト用の検証子（fetch_world参照）。
+        """
+        results: "queue.Queue[Any]" = queue.Queue()
+        stop_event = threading.Event()
+        engine_thread = threading.Thread(
+            target=lambda: asyncio.run(self._run_fetch_engine(urls, concurrency, validators or {}, max_attempts, results, stop_event)),
+            daemon=True
+        )
+        engine_thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _ENGINE_DONE:
+                    break
+                yield item
+        finally:
+            # 呼び出し側が途中で打ち切った場合も残りの取得を止める
+            stop_event.set()
+            engine_thread.join()
+
+    async def _run_fetch_engine(self, urls: Iterable[str], concurrency: int,
+                                validators: Dict[str, Dict[str, Any]], max_attempts: int,
+                                results: "queue.Queue[Any]", stop_event: threading.Event) -> None:
+        """非同期取得エンジン本体"""
+        concurrency = max(1, concurrency)
+        url_queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=concurrency * 2)
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def worker() -> None:
+            while True:
+                url = await url_queue.get()
+                if url is None:
+                    return
+                if stop_event.is_set():
+                    continue
+                # 取得処理はfetch_worldと共通（レートリミッターの待機も実行スレッド側で行う）
+                status, world_data = await loop.run_in_executor(
+                    executor, self._fetch, url, validators.get(url), max_attempts, stop_event
+                )
+                results.put((url, status, world_data))
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for url in urls:
+                if stop_event.is_set():
+                    break
+                await url_queue.put(url)
+        except Exception as e:
+            logger.error(f"❌ 非同期取得エンジンエラー: {e}")
+        finally:
+            for _ in workers:
+                await url_queue.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+            executor.shutdown(wait=True)
+            results.put(_ENGINE_DONE)
+    
+    def _extract_world_id(self, url: str) -> Optional[str]:
+        """URLからワールドIDを抽出（launch URL・ワールドID単体にも対応）"""
+        return normalize_world_id(url)
     
-    def download_thumbnail(self, world_data: Dict[str, Any], output_dir: str) -> Optional[Tuple[str, str]]:
-        """サムネイル画像をダウンロード。('downloaded', path)または('skipped', path)を返す"""
+    def download_thumbnail(self, world_data: Dict[str, Any], output_dir: str,
+                           manifest: Optional[ThumbnailManifest] = None) -> Optional[Tuple[str, str]]:
+        """サムネイル画像をダウンロード。('downloaded', path)または('skipped', path)を返す
+
+        画像はチャンク単位で一時ファイルに書き込み、完了後にリネームするため
+        途中で失敗しても不完全な画像は残らない。
+        manifestを渡した場合は取得元URLと内容ハッシュを比較し、変更された画像のみ更新する。
+        """
         try:
             world_id = world_data.get('id')
             thumbnail_url = world_data.get('thumbnailImageUrl') or world_data.get('imageUrl')
@@ -78,18 +309,51 @@ class VRChatWorldScraper:
             # ファイルパス設定
             filename = f"{world_id}.jpg"
             filepath = os.path.join(output_dir, filename)
+            exists = os.path.exists(filepath)
 
-            # 既存ファイルがある場合はスキップ
-            if os.path.exists(filepath):
+            # 既存ファイルがある場合はスキップ（マニフェスト使用時は取得元URLが同じ場合のみ）
+            entry = manifest.get(world_id) if manifest else None
+            if exists and (manifest is None or (entry and entry.get('url') == thumbnail_url)):
                 logger.info(f"📷 サムネイルスキップ（既存）: {filename}")
                 return ('skipped', filepath)
 
-            # ダウンロード実行
-            response = self.session.get(thumbnail_url, timeout=30)
-            response.raise_for_status()
+            # 以前の画像のETag/ハッシュ（マニフェスト未登録の既存ファイルはハッシュを計算）
+            previous_etag = entry.get('etag') if entry and exists else None
+            previous_hash = (entry.get('sha256') if entry else hash_file(filepath)) if exists else None
 
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            # ダウンロード実行（ストリーミングで一時ファイルに書き込み）
+            os.makedirs(output_dir, exist_ok=True)
+            headers = {'If-None-Match': previous_etag} if previous_etag else {}
+            with self.session.get(thumbnail_url, headers=headers, timeout=30, stream=True) as response:
+                if response.status_code == 304 and manifest:
+                    manifest.update(world_id, thumbnail_url, previous_etag, previous_hash)
+                    logger.info(f"📷 サムネイルスキップ（変更なし）: {filename}")
+                    return ('skipped', filepath)
+                response.raise_for_status()
+                etag = response.headers.get('ETag')
+                digest = hashlib.sha256()
+                fd, temp_path = tempfile.mkstemp(dir=output_dir, prefix=f".{world_id}.", suffix='.part')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=THUMBNAIL_CHUNK_SIZE):
+                            f.write(chunk)
+                            digest.update(chunk)
+                    content_hash = digest.hexdigest()
+                    # 内容が同じなら既存ファイルを残す
+                    if content_hash == previous_hash:
+                        os.remove(temp_path)
+                    else:
+                        os.replace(temp_path, filepath)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+
+            if manifest:
+                manifest.update(world_id, thumbnail_url, etag, content_hash)
+            if content_hash == previous_hash:
+                logger.info(f"📷 サムネイルスキップ（内容同一）: {filename}")
+                return ('skipped', filepath)
 
             logger.info(f"📷 サムネイル保存: {filename}")
             return ('downloaded', filepath)
@@ -98,66 +362,6 @@ class VRChatWorldScraper:
             logger.error(f"❌ サムネイルダウンロードエラー: {e}")
             return ('error', '')
     
-    def _check_existing_raw_data(self, world_id: str) -> Optional[Dict[str, Any]]:
-        """既存のraw_dataをチェックし、1日以内のデータがあれば返す"""
-        try:
-            # raw_dataファイルパス
-            raw_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'raw_data')
-            raw_data_file = os.path.join(raw_data_dir, f"vrchat_raw_{world_id}.json")
-            
-            # ファイルが存在しない場合
-            if not os.path.exists(raw_data_file):
-                return None
-            
-            # ファイルを読み込み
-            with open(raw_data_file, 'r', encoding='utf-8') as f:
-                raw_data = json.load(f)
-            
-            # scraped_atを確認
-            scraped_at_str = raw_data.get('raw_data', {}).get('scraped_at')
-            if not scraped_at_str:
-                return None
-            
-            # updateされた日付をISOフォーマットで取得
-            updated_at_str = raw_data.get('raw_data', {}).get('updated_at')
-            if not updated_at_str:
-                return None
-
-            # 日付を比較（1日以内かチェック）。タイムゾーンを考慮して比較。
-            scraped_at = datetime.fromisoformat(scraped_at_str.replace('Z', '+00:00'))
-            now_utc = datetime.now(timezone.utc)
-            time_diff = now_utc - scraped_at
-
-            # updated_atをタイムゾーン対応で処理
-#            try:
-#                if updated_at_str.endswith('Z'):
-#                    updated_at = datetime.fromisoformat(updated_at_str.replace('Z', '+00:00'))
-#                elif '+' in updated_at_str or updated_at_str.count('-') > 2:  # タイムゾーン情報あり
-#                    updated_at = datetime.fromisoformat(updated_at_str)
-#                else:
-#                   # タイムゾーン情報がない場合はUTCとして扱う
-#                    updated_at = datetime.fromisoformat(updated_at_str).replace(tzinfo=timezone.utc)
-#            except ValueError:
-#                # ISO形式でない場合はスキップ
-#                logger.warning(f"⚠️  日付形式が不正: {updated_at_str}")
-#                return None
-            
-#            update_diff = scraped_at - updated_at
-            
-            # 1日（24時間）以内なら既存データを返す
-            if time_diff.total_seconds() < 86400:  # 86400秒 = 24時間
-                return raw_data.get('raw_data', {})
-            
-            # ワールドの更新からの日付に応じて、更新間隔を開ける
-#            if time_diff.total_seconds() < update_diff.total_seconds() / 7:
- #               return raw_data.get('raw_data', {})
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"❌ 既存データチェックエラー {world_id}: {e}")
-            return None
-    
     def cleanup(self):
         """リソースのクリーンアップ"""
         if hasattr(self, 'session'):
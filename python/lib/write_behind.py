@@ -0,0 +1,181 @@
+"""
+ワールドデータ遅延書き込みライブラリ
+"""
+
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .mongodb_manager import MongoDBManager, BulkWorldWriter, DEFAULT_BULK_BATCH_SIZE
+from .utils import save_raw_data_many
+from .raw_data_store import get_raw_data_store
+
+logger = logging.getLogger(__name__)
+
+# 書き込み待ちの上限件数（超えると取得側のsubmitが空くまで待機する）
+DEFAULT_WRITE_QUEUE_SIZE = 1000
+# 書き込み待ちが溜まらなくてもこの秒数ごとに送信する
+DEFAULT_WRITE_FLUSH_INTERVAL_SECONDS = 1.0
+
+# 保存結果のコールバック (world_id, success, world_data)
+SaveResultCallback = Callable[[str, bool, Dict[str, Any]], None]
+
+_FLUSH = object()
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """ワールドデータのMongoDB保存と生データのディスク保存をバックグラウンドスレッドでまとめて行うライター
+
+    submitしたデータは上限付きのキューに入り、バックグラウンドスレッドがbulk_writeで保存したうえで、
+    保存に成功したものの生データを1回の追記でまとめて書き込む
+    （レスポンスキャッシュから取得したデータは、保存済みの生データがあれば追記しない）。
+    キューが満杯の場合はsubmitが空くまで待機する（取得が書き込みを追い越してメモリを使い切らないようにする）。
+    保存結果のコールバックは書き込みスレッドでは呼ばず、dispatch・flushを呼んだスレッドで実行する。
+    """
+
+    def __init__(self, mongodb: MongoDBManager, raw_data_dir: Optional[str] = None,
+                 max_queue_size: int = DEFAULT_WRITE_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_WRITE_FLUSH_INTERVAL_SECONDS):
+        self.mongodb = mongodb
+        self.raw_data_dir = raw_data_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submitted_count = 0
+        self.blocked_count = 0  # キューが満杯で待機した回数
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue_size))
+        # 書き込み済みで未通知の (callback, world_id, success, world_data)
+        self._completed: Deque[Tuple[Optional[SaveResultCallback], str, bool, Dict[str, Any]]] = deque()
+        self._writer = BulkWorldWriter(mongodb, batch_size=batch_size, on_result=self._on_bulk_result)
+        # 現在のバッチ内のworld_data(id) -> コールバック
+        self._callbacks: Dict[int, Optional[SaveResultCallback]] = {}
+        # 現在のバッチでMongoDBへの保存が終わった (callback, world_id, success, world_data)
+        self._results: List[Tuple[Optional[SaveResultCallback], str, bool, Dict[str, Any]]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def round_trips(self) -> int:
+        return self._writer.round_trips
+
+    def submit(self, world_data: Dict[str, Any], on_result: Optional[SaveResultCallback] = None) -> None:
+        """保存するワールドデータをキューに追加（満杯の場合は空くまで待機）"""
+        self._ensure_thread()
+        if self._queue.full():
+            self.blocked_count += 1
+        self._queue.put((world_data, on_result))
+        self.submitted_count += 1
+
+    def dispatch(self) -> int:
+        """書き込みが完了した分のコールバックを呼び出し、呼び出した件数を返す"""
+        count = 0
+        while self._completed:
+            callback, world_id, success, world_data = self._completed.popleft()
+            count += 1
+            if callback is not None:
+                callback(world_id, success, world_data)
+        return count
+
+    def flush(self) -> int:
+        """キューに残っているデータをすべて書き込み、コールバックを呼び出す"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+        return self.dispatch()
+
+    def close(self) -> int:
+        """残りをすべて書き込んでバックグラウンドスレッドを終了"""
+        count = self.flush()
+        with self._thread_lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+        return count + self.dispatch()
+
+    def _ensure_thread(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """バックグラウンドスレッド: 件数・時間・flush要求のいずれかでまとめて書き込む"""
+        pending = 0
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval if pending else None)
+            except queue.Empty:
+                # 一定時間新しいデータがなければ溜まっている分を送信
+                pending -= self._write_batch()
+                continue
+
+            # 例外で書き込みスレッドが終了してもflushが戻るよう、取り出した項目は必ずtask_doneする
+            try:
+                if item is _FLUSH or item is _STOP:
+                    pending -= self._write_batch()
+                    if item is _STOP:
+                        return
+                    continue
+
+                world_data, on_result = item
+                pending += 1
+                try:
+                    self._callbacks[id(world_data)] = on_result
+                    # 件数の上限に達するとBulkWorldWriterが送信し、_on_bulk_resultが呼ばれる
+                    self._writer.add(world_data)
+                except Exception as e:
+                    logger.error(f"❌ 遅延書き込みエラー: {e}")
+                    self._on_bulk_result(str(world_data.get('id', '')), False, world_data)
+                pending -= self._save_raw_data()
+            except Exception as e:
+                logger.error(f"❌ 遅延書き込みエラー: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write_batch(self) -> int:
+        """溜まっている保存を送信し、完了した件数を返す"""
+        try:
+            self._writer.flush()
+        except Exception as e:
+            logger.error(f"❌ 遅延書き込みエラー: {e}")
+        return self._save_raw_data()
+
+    def _on_bulk_result(self, world_id: str, success: bool, world_data: Dict[str, Any]) -> None:
+        """MongoDBへの保存結果を記録（生データはバッチ単位でまとめて保存する）"""
+        callback = self._callbacks.pop(id(world_data), None)
+        self._results.append((callback, world_id, success, world_data))
+
+    def _save_raw_data(self) -> int:
+        """保存に成功した分の生データを書き込んで結果を通知待ちにし、完了した件数を返す
+
+        生データの保存に失敗した分は失敗として通知する。
+        """
+        results, self._results = self._results, []
+        if not results:
+            return 0
+        if self.raw_data_dir:
+            try:
+                store = get_raw_data_store(self.raw_data_dir)
+                saved = [
+                    world_data for _, world_id, success, world_data in results
+                    if success and not (world_data.get('_from_cache', False) and world_id in store)
+                ]
+                if saved:
+                    save_raw_data_many(saved, self.raw_data_dir)
+            except Exception as e:
+                logger.error(f"❌ 生データ一括保存エラー: {e}")
+                results = [(callback, world_id, False, world_data)
+                           for callback, world_id, _, world_data in results]
+        self._completed.extend(results)
+        return len(results)
+
+    def __enter__(self) -> "WriteBehindWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
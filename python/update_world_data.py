@@ -12,9 +12,13 @@ update_mongodb.txtの設計に従い、以下の処理を行います：
 import os
 import sys
 import time
+import uuid
+import socket
+import argparse
 import requests
+from functools import partial
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Iterator
 
 # ライブラリパスを絶対パスで追加
 lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'lib'))
@@ -22,91 +26,101 @@ if lib_path not in sys.path:
     sys.path.insert(0, lib_path)
 
 from lib.mongodb_manager import MongoDBManager
-from lib.vrchat_scraper import VRChatWorldScraper
-from lib.utils import save_raw_data
+from lib.vrchat_scraper import VRChatWorldScraper, DEFAULT_RATE_PER_SECOND, DEFAULT_MAX_RATE_PER_SECOND
+from lib.response_cache import create_response_cache, DEFAULT_CACHE_TTL_SECONDS
+from lib.refresh_policy import compute_next_refresh_at
+from lib.refresh_scheduler import RefreshScheduler, RunBudget, load_backlog, save_backlog
+from lib.run_journal import RunJournal, COMPLETED_OUTCOMES
+from lib.tag_writer import TagWriter
+from lib.retry_queue import RetryQueue, DEFAULT_CORRUPT_AFTER_FAILURES
+from lib.cache_invalidation import CacheInvalidationTracker, TRACKED_FIELDS
+from lib.cache_warmer import load_warm_config, build_warm_paths, warm_cache, DEFAULT_WARM_CONCURRENCY
+from lib.write_behind import WriteBehindWriter
+
+
+# レート制限されたワールドを再取得する回数
+REQUEUE_ROUNDS = 2
+
+# 更新候補の取得時に読み込むフィールド（更新判定・優先度・条件付きリクエスト・タグ確認に使用）
+REFRESH_CANDIDATE_FIELDS = {
+    '_id': 0, 'world_id': 1, 'id': 1, 'source_url': 1, 'scraped_at': 1, 'updated_at': 1,
+    'next_refresh_at': 1, 'visits': 1, 'popularity': 1, 'tags': 1, 'http_etag': 1, 'http_last_modified': 1,
+    # 保存後にWebキャッシュの無効化対象を判定するため、キャッシュに影響するフィールドも読み込む
+    **{field: 1 for field in TRACKED_FIELDS}
+}
+
+# 次回更新日時の補完を書き込む件数の単位
+BACKFILL_BATCH_SIZE = 1000
+
+# 予算切れなどで未取得のまま持ち越したワールドの一覧（cache/以下）
+BACKLOG_FILENAME = 'refresh_backlog.json'
+
+# 既存ワールド更新の対象リストと処理結果を記録するジャーナル（cache/以下）
+JOURNAL_FILENAME = 'update_journal.jsonl'
+
+# new_worldsを確保してから他のワーカーが再確保できるようになるまでの時間（秒）
+NEW_WORLD_LEASE_SECONDS = 10 * 60
 
 
 class WorldDataUpdater:
     """ワールドデータ更新クラス"""
     
-    def __init__(self):
+    def __init__(self, concurrency: int = 1, rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+                 max_rate_per_second: float = DEFAULT_MAX_RATE_PER_SECOND,
+                 cache_ttl_hours: float = DEFAULT_CACHE_TTL_SECONDS / 3600,
+                 max_requests: Optional[int] = None, max_duration: Optional[float] = None,
+                 corrupt_after: int = DEFAULT_CORRUPT_AFTER_FAILURES):
         self.mongodb = MongoDBManager()
-        self.scraper = VRChatWorldScraper()
+        # 1回の実行で使うリクエスト数・実行時間の上限（リクエスト数はスクレイパーがAPIへの送信時に消費する）
+        self.budget = RunBudget(max_requests, max_duration)
+        self.scraper = VRChatWorldScraper(
+            rate_per_second=rate_per_second,
+            max_connections=max(10, concurrency),
+            max_rate_per_second=max_rate_per_second,
+            cache=create_response_cache(
+                os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'vrchat_api'),
+                cache_ttl_hours
+            ),
+            request_budget=self.budget
+        )
+        self.concurrency = concurrency  # 2以上の場合は非同期エンジンで並列取得
         self.success_count = 0
         self.skip_count = 0
+        self.not_modified_count = 0  # 304 Not Modifiedで取得日時のみ更新した件数
         self.error_count = 0
         self.error_worlds: List[str] = []
         self.corrupted_tag = "破損"  # エラー時に付与するタグ
+        # 破損タグの追加・削除はbulk_writeでまとめて書き込む
+        self.tag_writer = TagWriter(self.mongodb)
+        # 取得に失敗したワールドは指数バックオフで再試行し、corrupt_after回連続で失敗したら破損タグを付与
+        self.retry_queue = RetryQueue(self.mongodb)
+        self.corrupt_after = corrupt_after
+        self.retry_count = 0  # 再試行を予約した件数
+        # 実行中に変更されたワールドとフィールド（Webキャッシュの無効化対象）
+        self.cache_tracker = CacheInvalidationTracker()
+        self._previous_docs: Dict[str, Dict[str, Any]] = {}
+        # MongoDBへの保存と生データの保存はバックグラウンドでまとめて行い、取得処理を待たせない
+        self.raw_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'raw_data')
+        self.write_behind = WriteBehindWriter(self.mongodb, self.raw_data_dir)
+        self.backlog_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', BACKLOG_FILENAME)
+        # 中断時に再開するための処理ジャーナル（update_existing_worlds実行中のみ）
+        self.journal: Optional[RunJournal] = None
+        self.journal_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', JOURNAL_FILENAME)
+        # new_worldsの確保に記録するワーカーID（ホスト名・プロセスID・実行ごとの乱数）
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
         
     def should_update_world(self, world_doc: Dict[str, Any]) -> bool:
-        """ワールドを更新すべきかどうかを判定"""
+        """ワールドを更新すべきかどうかを判定（next_refresh_at未設定のワールド用）"""
         try:
-            now = datetime.now(timezone.utc)
-            
-            # scraped_at（最終スクレイピング日時）
-            scraped_at = world_doc.get('scraped_at')
-            if not scraped_at:
-                return True  # scraped_atがない場合は更新対象
+            # scraped_at（最終スクレイピング日時）がない場合は更新対象
+            if not world_doc.get('scraped_at'):
+                return True
             
-            # 日時変換（タイムゾーン情報を確実に設定）
-            if isinstance(scraped_at, str):
-                if scraped_at.endswith('Z'):
-                    scraped_at = datetime.fromisoformat(scraped_at.replace('Z', '+00:00'))
-                elif '+' in scraped_at or scraped_at.count('-') > 2:
-                    scraped_at = datetime.fromisoformat(scraped_at)
-                else:
-                    # タイムゾーン情報がない場合はUTCとして扱う
-                    scraped_at = datetime.fromisoformat(scraped_at).replace(tzinfo=timezone.utc)
-            elif hasattr(scraped_at, 'replace'):  # datetime object
-                # datetimeオブジェクトの場合、タイムゾーン情報がなければUTCを設定
-                if scraped_at.tzinfo is None:
-                    scraped_at = scraped_at.replace(tzinfo=timezone.utc)
-                else:
-                    # 既にタイムゾーン情報がある場合はUTCに変換
-                    scraped_at = scraped_at.astimezone(timezone.utc)
-            
-            # 経過時間 = 現在時刻 - scraped_at
-            elapsed_time = now - scraped_at
-            elapsed_hours = elapsed_time.total_seconds() / 3600
-            
-            # 1日未満は更新しない
-            if elapsed_hours < 24:
+            # 最低24時間・最長30日、その間は「経過時間*10 > 最終アップデート時間」で判定
+            next_refresh_at = compute_next_refresh_at(world_doc.get('scraped_at'), world_doc.get('updated_at'))
+            if next_refresh_at is None:
                 return False
-            
-            # updated_at（VRChatでの最終更新日時）
-            updated_at = world_doc.get('updated_at')
-            if updated_at:
-                if isinstance(updated_at, str):
-                    # 文字列の場合、タイムゾーン情報を適切に処理
-                    if updated_at.endswith('Z'):
-                        updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
-                    elif '+' in updated_at or updated_at.count('-') > 2:
-                        updated_at = datetime.fromisoformat(updated_at)
-                    else:
-                        # タイムゾーン情報がない場合はUTCとして扱う
-                        updated_at = datetime.fromisoformat(updated_at).replace(tzinfo=timezone.utc)
-                elif hasattr(updated_at, 'replace'):  # datetime object
-                    # datetimeオブジェクトの場合、タイムゾーン情報がなければUTCを設定
-                    if updated_at.tzinfo is None:
-                        updated_at = updated_at.replace(tzinfo=timezone.utc)
-                    else:
-                        # 既にタイムゾーン情報がある場合はUTCに変換
-                        updated_at = updated_at.astimezone(timezone.utc)
-                
-                # 最終アップデート時間 = scraped_at - updated_at
-                last_update_time = scraped_at - updated_at
-                last_update_hours = last_update_time.total_seconds() / 3600
-                
-                # 条件1: 経過時間*10 > 最終アップデート時間
-                condition1 = elapsed_hours * 10 > last_update_hours
-            else:
-                condition1 = True  # updated_atがない場合は更新対象
-            
-            # 条件2: 経過時間が30日以上
-            condition2 = elapsed_hours >= (30 * 24)  # 30日 = 720時間
-            
-            # どちらかの条件を満たせば更新対象
-            return condition1 or condition2
+            return datetime.now(timezone.utc) >= next_refresh_at
             
         except Exception as e:
             print(f"⚠️  更新判定エラー: {e}")
@@ -114,86 +128,93 @@ class WorldDataUpdater:
     
     def add_corrupted_tag(self, world_id: str, error_message: str = "") -> None:
         """ワールドに破損タグを追加（worlds_tagコレクションにもリレーションを作成）"""
+        # 書き込みはタグライターに溜めてまとめて行う
+        self.tag_writer.add(world_id, self.corrupted_tag)
+        self.cache_tracker.record_fields(world_id, ['tags'])
+        print(f"🏷️  破損タグを追加: {world_id} ({error_message})")
+    
+    def remove_corrupted_tag(self, world_id: str) -> None:
+        """ワールドから破損タグを削除（worlds_tagコレクションからもリレーションを削除）"""
+        self.tag_writer.remove(world_id, self.corrupted_tag)
+    
+    def _flush_tags(self) -> None:
+        """溜まっている破損タグの追加・削除を書き込み"""
         try:
-            # まず、破損タグのIDを取得
-            system_tags_collection = self.mongodb.get_collection('system_taglist')
-            if system_tags_collection is None:
-                print(f"⚠️  system_taglistコレクションにアクセスできません: {world_id}")
+            self.tag_writer.flush()
+        except Exception as e:
+            print(f"❌ 破損タグ書き込みエラー: {e}")
+    
+    def _apply_update_result(self, world_id: str, status: str, world_data: Optional[Dict[str, Any]],
+                             world_doc: Optional[Dict[str, Any]] = None) -> None:
+        """取得した既存ワールドのデータを保存"""
+        try:
+            # 前回取得から変更がない場合は取得日時のみ更新
+            if status == 'not_modified':
+                if self.mongodb.touch_world(world_id, (world_doc or {}).get('updated_at')):
+                    print(f"🔁 変更なし: {world_id}")
+                    if world_doc and self.corrupted_tag in (world_doc.get('tags') or []):
+                        self.remove_corrupted_tag(world_id)
+                        self.cache_tracker.record_fields(world_id, ['tags'])
+                    self.not_modified_count += 1
+                    self.retry_queue.record_success(world_id)
+                    self._record_outcome(world_id, 'not_modified')
+                else:
+                    print(f"❌ 取得日時の更新失敗: {world_id}")
+                    self.error_count += 1
+                    self.error_worlds.append(f"{world_id} - 取得日時更新失敗")
+                    self._record_outcome(world_id, 'error')
                 return
             
-            corrupted_tag_doc = system_tags_collection.find_one({'tagName': self.corrupted_tag})
-            if not corrupted_tag_doc:
-                print(f"⚠️  破損タグがsystem_taglistに存在しません: {world_id}")
+            # VRChat APIから取得したデータを確認
+            if not world_data:
+                print(f"❌ データ取得失敗: {world_id}")
+                self._handle_update_failure(world_id, "データ取得失敗")
                 return
             
-            corrupted_tag_id = str(corrupted_tag_doc['_id'])
-            
-            # 1. worldsコレクションのtagsフィールドに追加
-            worlds_collection = self.mongodb.get_collection('worlds')
-            if worlds_collection is not None:
-                worlds_collection.update_one(
-                    {'world_id': world_id},
-                    {'$addToSet': {'tags': self.corrupted_tag}}
-                )
-            
-            # 2. worlds_tagコレクションにリレーションを作成
-            worlds_tag_collection = self.mongodb.get_collection('worlds_tag')
-            if worlds_tag_collection is not None:
-                # 既存のリレーションがないか確認
-                existing_relation = worlds_tag_collection.find_one({
-                    'worldId': world_id,
-                    'tagId': corrupted_tag_id
-                })
-                
-                if not existing_relation:
-                    worlds_tag_collection.insert_one({
-                        'worldId': world_id,
-                        'tagId': corrupted_tag_id,
-                        'createdAt': datetime.now()
-                    })
-                    print(f"🏷️  破損タグを追加: {world_id} ({error_message})")
-                else:
-                    print(f"🏷️  破損タグは既に存在: {world_id}")
-            else:
-                print(f"⚠️  worlds_tagコレクションにアクセスできません: {world_id}")
+            # MongoDB・生データの保存はバックグラウンドで行い、保存後に_on_world_savedが呼ばれる
+            # キャッシュから取得したデータもMongoDBに保存して次回更新日時を進める（生データは追記しない）
+            self.write_behind.submit(world_data, self._on_world_saved)
                 
         except Exception as e:
-            print(f"❌ 破損タグ追加エラー {world_id}: {e}")
+            print(f"❌ 更新エラー {world_id}: {e}")
+            self._handle_update_failure(world_id, f"例外: {str(e)}")
     
-    def remove_corrupted_tag(self, world_id: str) -> None:
-        """ワールドから破損タグを削除（worlds_tagコレクションからもリレーションを削除）"""
+    def _on_world_saved(self, world_id: str, success: bool, world_data: Dict[str, Any]) -> None:
+        """MongoDBへの保存結果を反映（生データは保存成功時に書き込み済み）"""
         try:
-            # 破損タグのIDを取得
-            system_tags_collection = self.mongodb.get_collection('system_taglist')
-            if system_tags_collection is None:
-                return
-            
-            corrupted_tag_doc = system_tags_collection.find_one({'tagName': self.corrupted_tag})
-            if not corrupted_tag_doc:
-                return
-            
-            corrupted_tag_id = str(corrupted_tag_doc['_id'])
-            
-            # 1. worldsコレクションのtagsフィールドから削除
-            worlds_collection = self.mongodb.get_collection('worlds')
-            if worlds_collection is not None:
-                worlds_collection.update_one(
-                    {'world_id': world_id},
-                    {'$pull': {'tags': self.corrupted_tag}}
-                )
-            
-            # 2. worlds_tagコレクションからリレーションを削除
-            worlds_tag_collection = self.mongodb.get_collection('worlds_tag')
-            if worlds_tag_collection is not None:
-                result = worlds_tag_collection.delete_one({
-                    'worldId': world_id,
-                    'tagId': corrupted_tag_id
-                })
-                if result.deleted_count > 0:
-                    print(f"🗑️  破損タグを削除: {world_id}")
-                    
+            if success:
+                print(f"✅ 更新完了: {world_id}{'（キャッシュデータ）' if world_data.get('_from_cache', False) else ''}")
+                # 更新成功時は破損タグを削除
+                self.remove_corrupted_tag(world_id)
+                self.success_count += 1
+                self.cache_tracker.record_world(world_id, world_data, self._previous_docs.get(world_id, {}))
+                self.retry_queue.record_success(world_id)
+                self._record_outcome(world_id, 'ok')
+            else:
+                print(f"❌ 保存失敗: {world_id}")
+                self._handle_update_failure(world_id, "保存失敗")
         except Exception as e:
-            print(f"❌ 破損タグ削除エラー {world_id}: {e}")
+            print(f"❌ 更新エラー {world_id}: {e}")
+            self.error_count += 1
+            self.error_worlds.append(f"{world_id} - 例外: {str(e)}")
+            self._record_outcome(world_id, 'error')
+    
+    def _handle_update_failure(self, world_id: str, reason: str) -> None:
+        """既存ワールドの更新失敗を処理（リトライキューに登録し、連続失敗回数が閾値に達した場合のみ破損タグを付与）"""
+        attempts = self.retry_queue.record_failure(world_id, reason)
+        if attempts >= self.corrupt_after:
+            self.add_corrupted_tag(world_id, f"{reason}（{attempts}回連続）")
+            self.error_count += 1
+            self.error_worlds.append(f"{world_id} - {reason}（{attempts}回連続）")
+        else:
+            print(f"🔁 再試行を予約: {world_id}（{attempts}/{self.corrupt_after}回目の失敗）")
+            self.retry_count += 1
+        self._record_outcome(world_id, 'error')
+    
+    def _record_outcome(self, world_id: str, outcome: str) -> None:
+        """処理結果をジャーナルに記録（中断後の再開時に処理済みのワールドを飛ばすため）"""
+        if self.journal is not None:
+            self.journal.record(world_id, outcome)
     
     def update_existing_worlds(self) -> None:
         """既存ワールドの更新処理"""
@@ -204,79 +225,178 @@ class WorldDataUpdater:
                 print("❌ MongoDB接続エラー")
                 return
             
-            # worldsコレクションから全データを取得
-            worlds = self.mongodb.get_all_worlds()
-            print(f"📋 {len(worlds)}件のワールドデータを取得しました")
-            
-            update_targets: List[Tuple[str, str, Dict[str, Any]]] = []
-            
-            # 更新対象を選定
-            for world in worlds:
-                if self.should_update_world(world):
-                    source_url = world.get('source_url')
-                    if source_url:
-                        world_id = world.get('world_id') or world.get('id', '')
-                        update_targets.append((world_id, source_url, world))
-            
-            print(f"🎯 {len(update_targets)}件が更新対象です")
+            # 前回の実行が中断されていれば、記録済みの対象リストのうち未処理のワールドから再開する
+            journal = RunJournal(self.journal_path)
+            resumed = journal.load()
+            if resumed is not None:
+                targets, outcomes = resumed
+                completed = {world_id for world_id, outcome in outcomes.items() if outcome in COMPLETED_OUTCOMES}
+                update_targets = [
+                    (target['world_id'], target['source_url'], target['doc'])
+                    for target in targets if target['world_id'] not in completed
+                ]
+                print(f"♻️  中断された実行を再開します: 処理済み {len(completed)}件 / 残り {len(update_targets)}件")
+            else:
+                update_targets = self._select_update_targets()
+                if update_targets:
+                    journal.start([
+                        {'world_id': world_id, 'source_url': source_url, 'doc': world}
+                        for world_id, source_url, world in update_targets
+                    ])
+            self.journal = journal
             
             if not update_targets:
                 print("✅ 更新対象のワールドはありません")
+                journal.complete()
+                self.journal = None
                 return
             
-            # 更新処理を実行
-            for i, (world_id, source_url, _) in enumerate(update_targets, 1):
-                
-                print(f"\\n🔄 [{i}/{len(update_targets)}] 更新中: {world_id}")
-                
-                try:
-                    # VRChat APIからデータを取得
-                    world_data = self.scraper.scrape_world_by_url(source_url)
-                    if not world_data:
-                        print(f"❌ データ取得失敗: {world_id}")
-                        self.add_corrupted_tag(world_id, "データ取得失敗")
-                        self.error_count += 1
-                        self.error_worlds.append(f"{world_id} - データ取得失敗")
-                        continue
+            # 再試行日時を過ぎたリトライキューのワールド
+            due_retries = self.retry_queue.load_due()
+            if due_retries:
+                print(f"🔁 リトライ待ちの{len(due_retries)}件を優先して取得します")
+            
+            # 訪問数・人気度で重み付けした鮮度の高い順に取得する（前回の持ち越し分・リトライ待ちを優先）
+            scheduler = RefreshScheduler(carried_over=set(load_backlog(self.backlog_path)) | set(due_retries))
+            for world_id, source_url, world in update_targets:
+                scheduler.push(world_id, source_url, world)
+            
+            # 更新処理を実行（レート制限されたワールドは破損扱いせず再キューする）
+            url_to_world_id = {source_url: world_id for world_id, source_url, _ in update_targets}
+            # 保存済みのETag/Last-Modifiedで条件付きリクエストを行う
+            url_to_world_doc = {source_url: world for _, source_url, world in update_targets}
+            self._previous_docs = {world_id: world for world_id, _, world in update_targets}
+            round_total = len(scheduler)
+            pending_urls: Iterator[str] = (source_url for _, source_url in scheduler)
+            deferred_urls: List[str] = []
+            over_budget_urls: List[str] = []  # 予算切れで未送信のURL
+            suspended_urls: List[str] = []  # API障害（サーキットブレーカー遮断中）で未送信のURL
+            for _ in range(REQUEUE_ROUNDS + 1):
+                deferred_urls = []
+                fetch_results = self.scraper.fetch_many(self._within_budget(pending_urls, over_budget_urls), self.concurrency, url_to_world_doc)
+                for i, (source_url, status, world_data) in enumerate(fetch_results, 1):
+                    world_id = url_to_world_id.get(source_url, source_url)
                     
-                    # キャッシュから取得した場合はスキップ
-                    if world_data.get('_from_cache', False):
-                        print(f"⏭️  キャッシュデータのためスキップ: {world_id}")
-                        self.skip_count += 1
+                    print(f"\\n🔄 [{i}/{round_total}] 更新中: {world_id}")
+                    
+                    if status == 'rate_limited':
+                        print(f"⏳ レート制限のため再キュー: {world_id}")
+                        deferred_urls.append(source_url)
+                        continue
+                    if status == 'over_budget':
+                        over_budget_urls.append(source_url)
+                        continue
+                    if status == 'circuit_open':
+                        # API障害中は破損タグを付けず次回に持ち越す
+                        print(f"⛔ API障害のため未取得: {world_id}")
+                        suspended_urls.append(source_url)
                         continue
                     
-                    # MongoDBに保存
-                    if self.mongodb.save_world_data(world_data):
-                        print(f"✅ 更新完了: {world_id}")
-                        # 更新成功時は破損タグを削除
-                        self.remove_corrupted_tag(world_id)
-                        self.success_count += 1
-                        
-                        # 生データも保存
-                        raw_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'raw_data')
-                        save_raw_data(world_data, raw_data_dir)
-                        
-                        # レート制限（2秒間隔）
-                        if i < len(update_targets):
-                            time.sleep(2)
-                    else:
-                        print(f"❌ 保存失敗: {world_id}")
-                        self.add_corrupted_tag(world_id, "保存失敗")
-                        self.error_count += 1
-                        self.error_worlds.append(f"{world_id} - 保存失敗")
-                        
-                except Exception as e:
-                    print(f"❌ 更新エラー {world_id}: {e}")
-                    self.add_corrupted_tag(world_id, f"例外: {str(e)}")
-                    self.error_count += 1
-                    self.error_worlds.append(f"{world_id} - 例外: {str(e)}")
-                    continue
+                    self._apply_update_result(world_id, status, world_data, url_to_world_doc.get(source_url))
+                    self.write_behind.dispatch()
+                
+                if not deferred_urls or self.budget.exhausted:
+                    break
+                print(f"🔁 レート制限された{len(deferred_urls)}件を再取得します")
+                round_total = len(deferred_urls)
+                pending_urls = iter(deferred_urls)
+            
+            self._flush_write_behind()
+            
+            if over_budget_urls:
+                print(f"⏱️  実行予算に達したため{len(over_budget_urls)}件を次回に持ち越します")
+                self.skip_count += len(over_budget_urls)
+            if deferred_urls:
+                print(f"⏭️  レート制限が続いたため{len(deferred_urls)}件を次回に持ち越します")
+                self.skip_count += len(deferred_urls)
+            if suspended_urls:
+                print(f"⛔ API障害のため{len(suspended_urls)}件を次回に持ち越します")
+                self.skip_count += len(suspended_urls)
+            
+            # 持ち越したワールドは次回の実行で優先して取得する
+            save_backlog(self.backlog_path, [
+                url_to_world_id[source_url]
+                for source_url in over_budget_urls + deferred_urls + suspended_urls
+            ])
+            
+            # 最後まで処理できたのでジャーナルを削除
+            self.journal.complete()
+            self.journal = None
                     
         except Exception as e:
             print(f"❌ 既存ワールド更新処理エラー: {e}")
+        finally:
+            self._flush_write_behind()
+            self._flush_tags()
+            # 中断・エラー時はジャーナルを残し、次回の実行で再開する
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+    
+    def _select_update_targets(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """更新対象の(world_id, source_url, world_doc)を選定"""
+        # 次回更新日時を過ぎたワールドのみをインデックスで取得
+        # 候補はカーソルからバッチ単位で読み込みながら判定し、対象外のドキュメントは保持しない
+        worlds = self.mongodb.get_refresh_candidates(projection=REFRESH_CANDIDATE_FIELDS)
+        
+        update_targets: List[Tuple[str, str, Dict[str, Any]]] = []
+        backfill: Dict[str, datetime] = {}
+        backfill_count = 0
+        candidate_count = 0
+        
+        for world in worlds:
+            candidate_count += 1
+            world_id = world.get('world_id') or world.get('id', '')
+            # next_refresh_at未設定（旧データ）は従来の判定を行い、対象外なら次回更新日時を補完する
+            if world.get('next_refresh_at') is None and not self.should_update_world(world):
+                next_refresh_at = compute_next_refresh_at(world.get('scraped_at'), world.get('updated_at'))
+                if world_id and next_refresh_at is not None:
+                    backfill[world_id] = next_refresh_at
+                    # 補完分も溜め込まずに一定件数ごとに書き込む
+                    if len(backfill) >= BACKFILL_BATCH_SIZE:
+                        self.mongodb.set_next_refresh_at(backfill)
+                        backfill_count += len(backfill)
+                        backfill = {}
+                continue
+            source_url = world.get('source_url')
+            if source_url:
+                update_targets.append((world_id, source_url, world))
+        
+        print(f"📋 {candidate_count}件の更新候補を取得しました")
+        if backfill:
+            self.mongodb.set_next_refresh_at(backfill)
+            backfill_count += len(backfill)
+        if backfill_count:
+            print(f"🗓️  {backfill_count}件の次回更新日時を補完しました")
+        
+        print(f"🎯 {len(update_targets)}件が更新対象です")
+        return update_targets
+    
+    def _within_budget(self, urls: Iterator[str], over_budget_urls: List[str]) -> Iterator[str]:
+        """予算が残っている間だけURLを返し、予算切れ以降のURLはover_budget_urlsに移す
+
+        予算はスクレイパーがAPIへ送信する時点で消費する。
+        """
+        for url in urls:
+            if self.budget.exhausted:
+                over_budget_urls.append(url)
+                over_budget_urls.extend(urls)
+                return
+            yield url
+    
+    def _flush_write_behind(self) -> None:
+        """バックグラウンドの保存待ちをすべて書き込み、保存結果を反映"""
+        try:
+            self.write_behind.flush()
+        except Exception as e:
+            print(f"❌ 保存待ちの書き込みエラー: {e}")
     
     def process_new_worlds(self) -> None:
-        """新規ワールドの処理"""
+        """新規ワールドの処理
+
+        new_worldsのドキュメントはリース付きで1件ずつ確保するため、
+        複数のプロセス・ホストで同時に実行しても同じURLを重複して取得しない。
+        """
         print("\\n➕ 新規ワールドの処理を開始...")
         
         try:
@@ -290,96 +410,72 @@ class WorldDataUpdater:
                 print("❌ new_worldsコレクションにアクセスできません")
                 return
             
-            # new_worldsコレクションからデータを取得
-            new_worlds = list(new_worlds_collection.find({'status': {'$in': ['pending', 'error']}}))
-            
-            if not new_worlds:
+            pending_count = self.mongodb.count_claimable_new_worlds(self.worker_id)
+            if not pending_count:
                 print("✅ 処理対象の新規ワールドはありません")
                 return
             
-            print(f"📋 {len(new_worlds)}件の新規ワールドを処理します")
+            print(f"📋 {pending_count}件の新規ワールドが処理待ちです（ワーカー: {self.worker_id}）")
             
             processed_ids: List[Any] = []
+            i = 0
             
-            for i, new_world in enumerate(new_worlds, 1):
+            while True:
+                if self.budget.exhausted:
+                    print("⏱️  実行予算に達したため残りの新規ワールドは次回に持ち越します")
+                    break
+                
+                # 処理待ち・リース切れのドキュメントを1件確保（処理中ステータスとリース期限を設定）
+                new_world = self.mongodb.claim_new_world(self.worker_id, NEW_WORLD_LEASE_SECONDS)
+                if new_world is None:
+                    break
+                
+                i += 1
                 world_url = new_world.get('url', '')
                 new_world_id = new_world.get('_id')
                 
                 if not world_url:
+                    self._release_new_world(new_world_id, {'status': 'error', 'error_message': 'URLなし'})
                     continue
                 
-                print(f"\\n🔄 [{i}/{len(new_worlds)}] 新規ワールド処理: {world_url}")
+                print(f"\\n🔄 [{i}/{pending_count}] 新規ワールド処理: {world_url}")
                 
                 try:
-                    # new_worldsのステータスを処理中に更新
-                    new_worlds_collection.update_one(
-                        {'_id': new_world_id},
-                        {'$set': {'status': 'processing', 'processed_at': datetime.now()}}
-                    )
-                    
                     # VRChat APIからデータを取得
-                    world_data = self.scraper.scrape_world_by_url(world_url)
+                    status, world_data = self.scraper.fetch_world(world_url)
+                    if status in ('rate_limited', 'circuit_open', 'over_budget'):
+                        # レート制限・API障害・予算切れはエラー扱いせず、次回の処理対象として戻す
+                        print(f"⏳ API制限のため次回に持ち越し: {world_url}")
+                        self._release_new_world(new_world_id, {'status': 'pending'})
+                        self.skip_count += 1
+                        continue
                     if not world_data:
                         print(f"❌ データ取得失敗: {world_url}")
                         # ステータスをエラーに更新
-                        new_worlds_collection.update_one(
-                            {'_id': new_world_id},
-                            {'$set': {'status': 'error', 'error_message': 'データ取得失敗'}}
-                        )
+                        self._release_new_world(new_world_id, {'status': 'error', 'error_message': 'データ取得失敗'})
                         # world_idが取得できないため、URLベースで記録
                         self.error_count += 1
                         self.error_worlds.append(f"{world_url} - データ取得失敗")
                         continue
                     
-                    # worldsコレクションに保存
-                    if self.mongodb.save_world_data(world_data):
-                        print(f"✅ 新規ワールド追加完了: {world_data.get('id')}")
-                        # 保存成功時は破損タグを削除（既存の場合）
-                        if world_data.get('id'):
-                            self.remove_corrupted_tag(world_data['id'])
-                        
-                        # 生データも保存
-                        raw_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'raw_data')
-                        save_raw_data(world_data, raw_data_dir)
-                        
-                        # ステータスを完了に更新
-                        new_worlds_collection.update_one(
-                            {'_id': new_world_id},
-                            {'$set': {'status': 'completed'}}
-                        )
-                        
-                        processed_ids.append(new_world_id)
-                        self.success_count += 1
-                        
-                        # レート制限（2秒間隔）
-                        if i < len(new_worlds):
-                            time.sleep(2)
-                    else:
-                        print(f"❌ 保存失敗: {world_url}")
-                        # world_dataがある場合は破損タグを付与
-                        if world_data and world_data.get('id'):
-                            self.add_corrupted_tag(world_data['id'], "保存失敗")
-                        # ステータスをエラーに更新
-                        new_worlds_collection.update_one(
-                            {'_id': new_world_id},
-                            {'$set': {'status': 'error', 'error_message': '保存失敗'}}
-                        )
-                        self.error_count += 1
-                        self.error_worlds.append(f"{world_url} - 保存失敗")
+                    # worldsコレクション・生データへの保存はバックグラウンドで行い、保存後にステータスを更新
+                    self.write_behind.submit(
+                        world_data, partial(self._on_new_world_saved, new_world_id, world_url, processed_ids)
+                    )
                         
                 except Exception as e:
                     print(f"❌ 新規ワールド処理エラー {world_url}: {e}")
                     # ステータスをエラーに更新
                     if new_world_id:
-                        new_worlds_collection.update_one(
-                            {'_id': new_world_id},
-                            {'$set': {'status': 'error', 'error_message': str(e)}}
-                        )
+                        self._release_new_world(new_world_id, {'status': 'error', 'error_message': str(e)})
                     self.error_count += 1
                     self.error_worlds.append(f"{world_url} - 例外: {str(e)}")
                     continue
+                finally:
+                    self.write_behind.dispatch()
             
-            # 完了したnew_worldsデータを削除
+            # 保存待ちを書き込んでから、完了したnew_worldsデータを削除
+            self._flush_write_behind()
             if processed_ids:
                 delete_result = new_worlds_collection.delete_many(
                     {'_id': {'$in': processed_ids}, 'status': 'completed'}
@@ -388,6 +484,45 @@ class WorldDataUpdater:
                 
         except Exception as e:
             print(f"❌ 新規ワールド処理エラー: {e}")
+        finally:
+            self._flush_write_behind()
+            self._flush_tags()
+    
+    def _on_new_world_saved(self, new_world_id: Any, world_url: str, processed_ids: List[Any],
+                            world_id: str, success: bool, world_data: Dict[str, Any]) -> None:
+        """新規ワールドのMongoDBへの保存結果を反映し、new_worldsのステータスを更新"""
+        try:
+            if success:
+                print(f"✅ 新規ワールド追加完了: {world_id}")
+                # 保存成功時は破損タグを削除（既存の場合）
+                self.remove_corrupted_tag(world_id)
+                self.cache_tracker.record_world(world_id, world_data)
+                
+                # ステータスを完了に更新
+                if self._release_new_world(new_world_id, {'status': 'completed'}):
+                    processed_ids.append(new_world_id)
+                self.success_count += 1
+            else:
+                print(f"❌ 保存失敗: {world_url}")
+                # world_dataがある場合は破損タグを付与
+                if world_id:
+                    self.add_corrupted_tag(world_id, "保存失敗")
+                # ステータスをエラーに更新
+                self._release_new_world(new_world_id, {'status': 'error', 'error_message': '保存失敗'})
+                self.error_count += 1
+                self.error_worlds.append(f"{world_url} - 保存失敗")
+        except Exception as e:
+            print(f"❌ 新規ワールド処理エラー {world_url}: {e}")
+            self._release_new_world(new_world_id, {'status': 'error', 'error_message': str(e)})
+            self.error_count += 1
+            self.error_worlds.append(f"{world_url} - 例外: {str(e)}")
+    
+    def _release_new_world(self, new_world_id: Any, fields: Dict[str, Any]) -> bool:
+        """確保したnew_worldsドキュメントのステータスを更新してリースを解放"""
+        if self.mongodb.release_new_world(new_world_id, self.worker_id, fields):
+            return True
+        print(f"⚠️  リース期限切れのため他のワーカーに引き継がれました: {new_world_id}")
+        return False
     
     def print_summary(self):
         """処理結果のサマリーを表示"""
@@ -395,7 +530,17 @@ class WorldDataUpdater:
         print("📊 ワールドデータ更新結果サマリー")
         print(f"✅ 成功: {self.success_count}件")
         print(f"⏭️  スキップ: {self.skip_count}件")
+        print(f"🔁 変更なし: {self.not_modified_count}件")
+        print(f"⏳ 再試行予約: {self.retry_count}件")
         print(f"❌ エラー: {self.error_count}件")
+        if self.scraper.cache is not None:
+            cache_stats = self.scraper.cache.stats()
+            print(f"🗃️  キャッシュ: ヒット {cache_stats['hits']}件 / ミス {cache_stats['misses']}件")
+        if self.write_behind.round_trips:
+            print(f"📡 MongoDB一括保存: {self.write_behind.submitted_count}件を{self.write_behind.round_trips}回で送信"
+                  f"（書き込み待ち {self.write_behind.blocked_count}回）")
+        if self.tag_writer.added_count or self.tag_writer.removed_count:
+            print(f"🏷️  破損タグ: 追加 {self.tag_writer.added_count}件 / 削除 {self.tag_writer.removed_count}件")
         if self.error_count > 0:
             print(f"🏷️  エラーワールドには'{self.corrupted_tag}'タグが付与されました")
         print("=" * 50)
@@ -417,13 +562,25 @@ class WorldDataUpdater:
     
     def cleanup(self):
         """リソースのクリーンアップ"""
+        # 保存待ちのデータを書き込んでからタグ・接続を閉じる
+        if hasattr(self, 'write_behind'):
+            try:
+                self.write_behind.close()
+            except Exception as e:
+                print(f"❌ 保存待ちの書き込みエラー: {e}")
+        if hasattr(self, 'tag_writer'):
+            self._flush_tags()
         if hasattr(self, 'scraper'):
             self.scraper.cleanup()
         if hasattr(self, 'mongodb'):
             self.mongodb.close()
 
     def clear_worlds_cache(self) -> None:
-        """Web APIのワールドキャッシュをクリア"""
+        """Web APIのワールドキャッシュのうち、今回変更されたワールド・一覧のみを無効化"""
+        if not self.cache_tracker.has_changes:
+            print("ℹ️  変更されたワールドがないため、キャッシュクリアをスキップします")
+            return
+        
         cache_url = os.getenv('CACHE_CLEAR_URL')
         if not cache_url:
             base_url = os.getenv('WEB_BASE_URL')
@@ -435,26 +592,89 @@ class WorldDataUpdater:
             print("ℹ️  キャッシュクリアをスキップ: CACHE_CLEAR_URL/WEB_BASE_URL または CACHE_CLEAR_TOKEN 未設定")
             return
 
+        payload = self.cache_tracker.payload()
         try:
             response = requests.post(
                 cache_url,
                 headers={'x-cache-clear-token': token},
+                json=payload,
                 timeout=10
             )
             if response.ok:
-                print("🧹 キャッシュクリア完了")
+                print(f"🧹 キャッシュクリア完了: ワールド {len(self.cache_tracker.world_ids)}件 / "
+                      f"一覧 {', '.join(payload['prefixes']) or 'なし'}")
             else:
                 print(f"⚠️  キャッシュクリア失敗: {response.status_code} {response.text}")
         except requests.RequestException as e:
             print(f"⚠️  キャッシュクリア通信エラー: {e}")
+    
+    def warm_worlds_cache(self, config_path: Optional[str] = None,
+                          concurrency: int = DEFAULT_WARM_CONCURRENCY) -> None:
+        """よく使われる一覧・集計のAPIを呼び出し、Webキャッシュを事前に作成"""
+        base_url = os.getenv('WEB_BASE_URL')
+        if not base_url:
+            print("ℹ️  キャッシュ事前読み込みをスキップ: WEB_BASE_URL 未設定")
+            return
+        
+        config = load_warm_config(config_path)
+        # 破損タグは一覧で絞り込まれることがないため対象外
+        popular_tag_ids = self.mongodb.get_popular_tag_ids(
+            config.get('popular_tags', 0),
+            exclude=[self.tag_writer.resolve_tag_id(self.corrupted_tag)]
+        )
+        paths = build_warm_paths(config, popular_tag_ids)
+        if not paths:
+            return
+        
+        print(f"\\n🔥 キャッシュ事前読み込み: {len(paths)}件（同時 {concurrency}件）")
+        started_at = time.monotonic()
+        success, failed = warm_cache(base_url, paths, concurrency)
+        print(f"🔥 キャッシュ事前読み込み完了: 成功 {success}件 / 失敗 {len(failed)}件 "
+              f"({time.monotonic() - started_at:.1f}秒)")
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='ワールドデータ更新プログラム')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='同時リクエスト数（2以上で非同期エンジンを使用、デフォルト: 1）')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE_PER_SECOND,
+                        help=f'1秒あたりの初期リクエスト数（デフォルト: {DEFAULT_RATE_PER_SECOND}）')
+    parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE_PER_SECOND,
+                        help=f'自動調整時の1秒あたりの最大リクエスト数（デフォルト: {DEFAULT_MAX_RATE_PER_SECOND}）')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL_SECONDS / 3600,
+                        help='APIレスポンスキャッシュの有効期間（時間、0で無効、デフォルト: 24）')
+    parser.add_argument('--max-requests', type=int, default=None,
+                        help='1回の実行で送信するAPIリクエスト数の上限（デフォルト: 無制限）')
+    parser.add_argument('--max-duration', type=float, default=None,
+                        help='1回の実行で新たなリクエストを送信する時間の上限（分、デフォルト: 無制限）')
+    parser.add_argument('--corrupt-after', type=int, default=DEFAULT_CORRUPT_AFTER_FAILURES,
+                        help=f'破損タグを付与するまでの連続失敗回数（デフォルト: {DEFAULT_CORRUPT_AFTER_FAILURES}）')
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='更新後によく使われる一覧・集計のWebキャッシュを事前に作成')
+    parser.add_argument('--warm-config', default=None,
+                        help='事前読み込みするクエリの設定JSON（デフォルト: 環境変数CACHE_WARM_CONFIGまたは既定値）')
+    parser.add_argument('--warm-concurrency', type=int, default=DEFAULT_WARM_CONCURRENCY,
+                        help=f'事前読み込みの同時リクエスト数（デフォルト: {DEFAULT_WARM_CONCURRENCY}）')
+    return parser.parse_args()
 
 
 def main():
     """メイン処理"""
+    args = parse_args()
+    
     print("🔄 ワールドデータ更新プログラム")
     print("=" * 50)
     
-    updater = WorldDataUpdater()
+    updater = WorldDataUpdater(
+        concurrency=args.concurrency,
+        rate_per_second=args.rate,
+        max_rate_per_second=args.max_rate,
+        cache_ttl_hours=args.cache_ttl,
+        max_requests=args.max_requests,
+        max_duration=args.max_duration * 60 if args.max_duration is not None else None,
+        corrupt_after=args.corrupt_after
+    )
     
     try:
         # 1. 既存ワールドの更新処理
@@ -465,8 +685,12 @@ def main():
         
         # 3. キャッシュクリア
         updater.clear_worlds_cache()
+        
+        # 4. キャッシュ事前読み込み（任意）
+        if args.warm_cache:
+            updater.warm_worlds_cache(args.warm_config, args.warm_concurrency)
 
-        # 4. 結果サマリー
+        # 5. 結果サマリー
         updater.print_summary()
         
     except KeyboardInterrupt:
@@ -8,6 +8,7 @@ raw_dataフォルダにある生データをMongoDB Atlasにアップロード
 
 import os
 import sys
+import argparse
 
 # ライブラリパスを絶対パスで追加
 lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'lib'))
@@ -15,11 +16,21 @@ if lib_path not in sys.path:
     sys.path.insert(0, lib_path)
 
 from lib.mongodb_manager import MongoDBManager
-from lib.utils import load_raw_data_files, load_raw_data_file
+from lib.utils import scan_raw_data
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description='MongoDB Atlasアップローダー')
+    parser.add_argument('--changed-only', action='store_true',
+                        help='前回の全件アップロード以降に追加・更新された生データのみアップロード')
+    return parser.parse_args()
 
 
 def main():
     """メイン処理"""
+    args = parse_args()
+    
     print("🗄️  MongoDB Atlasアップローダー")
     print("=" * 50)
     
@@ -32,48 +43,49 @@ def main():
     
     print("✅ MongoDB Atlas接続成功")
     
-    # 生データファイルを読み込み
-    raw_data_files = load_raw_data_files('raw_data')
-    if not raw_data_files:
-        print("❌ raw_dataフォルダにJSONファイルが見つかりません")
-        return
-    
-    print(f"📋 {len(raw_data_files)}件の生データファイルを発見")
+    # 生データを1件ずつ読み込みながらアップロード
+    if args.changed_only:
+        print("📋 前回以降に追加・更新された生データのみアップロードします")
     print("-" * 50)
     
-    success_count = 0
-    error_count = 0
+    total_count = 0
+    failed_world_ids = set()  # 次回の--changed-onlyでも対象にするワールド
+    
+    def on_result(world_id: str, success: bool, _raw_data) -> None:
+        """アップロード結果を表示"""
+        if success:
+            print(f"✅ {world_id}: アップロード完了")
+        else:
+            print(f"❌ {world_id}: アップロード失敗")
+            failed_world_ids.add(world_id)
     
-    for i, filename in enumerate(raw_data_files, 1):
-        filepath = os.path.join('raw_data', filename)
-        data = load_raw_data_file(filepath)
-        if not data:
-            print(f"❌ ファイル読み込み失敗: {filename}")
-            error_count += 1
-            continue
-        world_id = data.get('world_id', filename)
-        raw_data = data.get('raw_data', {})
-        print(f"\n🔄 [{i}/{len(raw_data_files)}] アップロード中: {world_id}")
-        try:
-            # MongoDBに保存
-            result = mongodb.save_world_data(raw_data)
-            if result:
-                print(f"✅ {world_id}: アップロード完了")
-                success_count += 1
-            else:
-                print(f"❌ {world_id}: アップロード失敗")
-                error_count += 1
-        except Exception as e:
-            print(f"❌ {world_id}: エラー - {str(e)}")
-            error_count += 1
-            continue
+    scan = scan_raw_data('raw_data', changed_only=args.changed_only)
+    
+    def iter_raw_data():
+        """走査した生データを読み込み件数を数えながら返す"""
+        nonlocal total_count
+        for i, data in enumerate(scan or [], 1):
+            total_count = i
+            yield data.get('raw_data', {})
+    
+    # 生データはまとめてbulk_writeで送信（件数・サイズが上限に達するごとに1往復）
+    writer = mongodb.save_worlds_bulk(iter_raw_data(), on_result=on_result)
+    
+    # 最後の送信まで終わってから走査済みとして記録（失敗したワールドは次回も対象にする）
+    if scan is not None:
+        scan.commit(failed_world_ids)
+    
+    if total_count == 0:
+        print("❌ アップロード対象の生データが見つかりません")
+        return
     
     # 結果サマリー
     print("\n" + "=" * 50)
     print("📊 アップロード結果サマリー")
-    print(f"✅ 成功: {success_count}件")
-    print(f"❌ エラー: {error_count}件")
-    print(f"📋 合計: {len(raw_data_files)}件")
+    print(f"✅ 成功: {writer.success_count}件")
+    print(f"❌ エラー: {writer.error_count}件")
+    print(f"📋 合計: {total_count}件")
+    print(f"📡 送信回数: {writer.round_trips}回")
     
     # データベース統計情報
     try:
@@ -69,19 +69,35 @@ export const getWorldsCache = async <T>(
   return value
 }
 
-export const clearWorldsCache = (prefix?: string) => {
+// prefixは'worlds:timeline'のように上位の階層を指定すると配下のキャッシュもまとめて削除する
+export const clearWorldsCache = (prefix?: string): number => {
   if (!prefix) {
+    const cleared = worldsCache.size
     worldsCache.clear()
     lastUpdatedAt = null
-    return
+    return cleared
   }
 
+  let cleared = 0
   worldsCache.forEach((_, key) => {
-    if (key.startsWith(`${prefix}|`)) {
+    if (key.startsWith(`${prefix}|`) || key.startsWith(`${prefix}:`)) {
       worldsCache.delete(key)
+      cleared += 1
     }
   })
   lastUpdatedAt = null
+  return cleared
+}
+
+// 指定したワールドの個別キャッシュ（worlds:by-id）のみを削除する
+export const clearWorldsCacheByIds = (worldIds: string[]): number => {
+  let cleared = 0
+  worldIds.forEach((worldId) => {
+    if (worldsCache.delete(buildCacheKey('worlds:by-id', [worldId]))) {
+      cleared += 1
+    }
+  })
+  return cleared
 }
 
 export const getWorldsCacheInfo = () => ({
@@ -0,0 +1,67 @@
+import type { NextApiRequest, NextApiResponse } from 'next'
+import { timingSafeEqual } from 'crypto'
+import { checkApiAdminAccess } from '@/lib/auth'
+import { clearWorldsCache, clearWorldsCacheByIds } from '@/lib/worldsCache'
+
+// 更新プログラムからの呼び出しはx-cache-clear-tokenヘッダーで認証する
+function hasValidCacheClearToken(req: NextApiRequest): boolean {
+  const expected = process.env.CACHE_CLEAR_TOKEN
+  const provided = req.headers['x-cache-clear-token']
+  if (!expected || typeof provided !== 'string') return false
+
+  const expectedBuffer = Buffer.from(expected)
+  const providedBuffer = Buffer.from(provided)
+  return expectedBuffer.length === providedBuffer.length && timingSafeEqual(expectedBuffer, providedBuffer)
+}
+
+const toStringArray = (value: unknown): string[] =>
+  Array.isArray(value) ? value.filter((item): item is string => typeof item === 'string' && item.length > 0) : []
+
+export default async function handler(
+  req: NextApiRequest,
+  res: NextApiResponse
+) {
+  if (req.method !== 'POST') {
+    res.setHeader('Allow', ['POST'])
+    return res.status(405).end(`Method ${req.method} Not Allowed`)
+  }
+
+  if (!hasValidCacheClearToken(req)) {
+    // トークンがない場合は管理者セッションを確認
+    const session = await checkApiAdminAccess(req, res)
+    if (!session) {
+      return
+    }
+  }
+
+  try {
+    // { worldIds, prefixes } で対象を指定した場合は該当するキャッシュのみ削除し、
+    // 何も指定しない場合は全キャッシュを削除する（{ prefix } は従来の単一指定）
+    const body = req.body && typeof req.body === 'object' ? req.body : {}
+    const worldIds = toStringArray(body.worldIds)
+    const prefixes = toStringArray(body.prefixes)
+    if (typeof body.prefix === 'string' && body.prefix) {
+      prefixes.push(body.prefix)
+    }
+
+    let cleared = 0
+    if (worldIds.length === 0 && prefixes.length === 0) {
+      cleared = clearWorldsCache()
+    } else {
+      cleared += clearWorldsCacheByIds(worldIds)
+      prefixes.forEach((prefix) => {
+        cleared += clearWorldsCache(prefix)
+      })
+    }
+
+    res.status(200).json({
+      success: true,
+      cleared,
+      worldIds: worldIds.length,
+      prefixes
+    })
+  } catch (error) {
+    console.error('Cache clear error:', error)
+    res.status(500).json({ success: false, error: 'Internal server error' })
+  }
+}